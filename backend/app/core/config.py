@@ -8,13 +8,81 @@ class Settings(BaseSettings):
     JWT_SECRET: str
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 30
+    USER_CACHE_SIZE: int = 10000
+    USER_CACHE_TTL_SECONDS: float = 30.0
+    # Let read-only endpoints take the user from signed token claims instead of the users collection
+    AUTH_TRUST_TOKEN_CLAIMS: bool = False
+    # New hashes use PASSWORD_SCHEME; older schemes or weaker rounds are rehashed on login
+    PASSWORD_SCHEME: str = "pbkdf2_sha256"
+    PASSWORD_PBKDF2_ROUNDS: int = 29000
+    PASSWORD_BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
 
     GEMINI_API_KEY: str | None = None
+    GEMINI_MODEL: str = "gemini-1.5-flash"
+    # Point at a local stub, e.g. GEMINI_API_ENDPOINT=http://127.0.0.1:8090 with GEMINI_TRANSPORT=rest
+    GEMINI_API_ENDPOINT: str | None = None
+    GEMINI_TRANSPORT: str | None = None
+
+    # "gemini", "fake" (local stand-in for tests) or "none"
+    LLM_BACKEND: str = "none"
+    LLM_BATCH_SIZE: int = 25
+    LLM_BATCH_WINDOW_MS: float = 50.0
+    LLM_MAX_CONCURRENCY: int = 4
+    LLM_TIMEOUT_SECONDS: float = 20.0
+    LLM_MAX_RETRIES: int = 2
 
     CORS_ORIGINS: str = "http://localhost:5173"
+    # /api/metrics serves Prometheus text format; this switches off the per-request
+    # latency middleware and the Mongo command listener
+    METRICS_ENABLED: bool = True
 
     MODEL_DIR: str = "./artifacts"
     CONFIDENCE_THRESHOLD: float = 0.65
+    MODEL_RELOAD_INTERVAL_SECONDS: float = 2.0
+    MODEL_TOP_K: int = 3
+    # Load the model in a background thread at startup instead of on the first request
+    MODEL_WARMUP: bool = True
+    # "joblib" or "compact" (mmapped float32 arrays shared by all workers, see app/ml/compact.py)
+    MODEL_FORMAT: str = "joblib"
+    # Where categorizer model scoring runs: a "process" pool keeps the TF-IDF transform
+    # from holding the GIL against the event loop; "thread" avoids the extra processes.
+    # Requests beyond workers + queue size get 503.
+    INFERENCE_EXECUTOR: str = "process"
+    INFERENCE_WORKERS: int = 1
+    INFERENCE_QUEUE_SIZE: int = 64
+    # Concurrent single predictions (predict, create transaction) wait up to the window
+    # for others and are scored as one matrix; 0 scores each request on its own
+    ML_BATCH_WINDOW_MS: float = 5.0
+    ML_BATCH_SIZE: int = 64
+
+    CATEGORIZE_CACHE_SIZE: int = 50000
+    CATEGORIZE_CACHE_TTL_SECONDS: float = 24 * 60 * 60
+    CATEGORIZE_CACHE_SHARED: bool = False
+
+    TRAIN_WORKERS: int = 1
+    TRAIN_JOB_STALE_SECONDS: float = 300.0
+    # Parallelism and metric for tuning runs (TrainRequest.tune); -1 uses every core
+    TRAIN_SEARCH_JOBS: int = -1
+    TRAIN_SEARCH_SCORING: str = "f1_macro"
+
+    # Transaction listings; limit is capped so one request cannot pull a whole history
+    TRANSACTIONS_PAGE_SIZE: int = 50
+    TRANSACTIONS_MAX_PAGE_SIZE: int = 200
+
+    EXPORT_BATCH_SIZE: int = 1000
+    REPORT_CACHE_DIR: str = "./report_cache"
+    REPORT_WORKERS: int = 1
+
+    RULES_CACHE_TTL_SECONDS: float = 60.0
+    RULES_CACHE_SIZE: int = 10000
+    RULES_MAX_PER_USER: int = 5000
+    CORRECTIONS_FOLD_INTERVAL_SECONDS: float = 60.0
+
+    INGEST_BATCH_SIZE: int = 1000
+    INGEST_DIR: str = "./uploads"
+    INGEST_WORKERS: int = 2
+    INGEST_JOB_STALE_SECONDS: float = 300.0
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,25 @@
+import base64
+import json
+from datetime import datetime
+
+
+# Opaque keyset cursors for listings sorted by (date desc, _id desc): the token is the
+# sort key of the last row served, so the next page starts right after it via the
+# index instead of skipping over everything before it.
+def encode_cursor(date: datetime, doc_id: str) -> str:
+    raw = json.dumps([date.isoformat(), doc_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        date, doc_id = json.loads(raw)
+        return datetime.fromisoformat(date), str(doc_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def after_cursor(token: str) -> dict:
+    date, doc_id = decode_cursor(token)
+    return {"$or": [{"date": {"$lt": date}}, {"date": date, "_id": {"$lt": doc_id}}]}
@@ -4,11 +4,21 @@ from jose import JWTError, jwt
 
 from app.core.config import settings
 from app.db.mongo import get_db
+from app.services.cache import TTLCache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
+# Authenticated users by id, so most requests skip the users lookup. Anything that
+# writes a user document must call invalidate_user so the next request reloads it.
+user_cache = TTLCache(maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL_SECONDS)
+token_claim_hits = 0
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db=Depends(get_db)):
+
+def invalidate_user(user_id: str) -> None:
+    user_cache.pop(user_id)
+
+
+def _decode_token(token: str) -> dict:
     try:
         payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
         user_id: str | None = payload.get("sub")
@@ -16,8 +26,38 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db=Depends(get_d
             raise HTTPException(status_code=401, detail="Invalid token")
     except JWTError as e:
         raise HTTPException(status_code=401, detail="Invalid token") from e
+    return payload
+
 
-    user = await db.users.find_one({"_id": user_id})
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
+async def _load_user(db, user_id: str) -> dict:
+    user = user_cache.get(user_id)
+    if user is None:
+        user = await db.users.find_one({"_id": user_id}, {"password_hash": 0})
+        if not user:
+            raise HTTPException(status_code=401, detail="User not found")
+        user_cache.set(user_id, user)
     return user
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db=Depends(get_db)):
+    payload = _decode_token(token)
+    return await _load_user(db, payload["sub"])
+
+
+async def get_token_user(token: str = Depends(oauth2_scheme), db=Depends(get_db)):
+    # For read-only endpoints that only need the user id: with AUTH_TRUST_TOKEN_CLAIMS
+    # the signed claims stand in for the users document until the token expires.
+    global token_claim_hits
+    payload = _decode_token(token)
+    if settings.AUTH_TRUST_TOKEN_CLAIMS and "email" in payload:
+        token_claim_hits += 1
+        return {"_id": payload["sub"], "email": payload["email"], "name": payload.get("name")}
+    return await _load_user(db, payload["sub"])
+
+
+def auth_stats() -> dict:
+    return {
+        "user_cache": user_cache.stats(),
+        "trust_token_claims": settings.AUTH_TRUST_TOKEN_CLAIMS,
+        "token_claim_hits": token_claim_hits,
+    }
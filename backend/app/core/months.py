@@ -0,0 +1,13 @@
+from datetime import datetime
+
+
+def month_range(month: str) -> tuple[datetime, datetime]:
+    if len(month) != 7 or month[4] != "-":
+        raise ValueError("Month must be YYYY-MM")
+    start = datetime.fromisoformat(month + "-01")
+    return start, add_months(start, 1)
+
+
+def add_months(month_start: datetime, months: int) -> datetime:
+    index = month_start.year * 12 + (month_start.month - 1) + months
+    return datetime(index // 12, index % 12 + 1, 1)
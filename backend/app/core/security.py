@@ -1,3 +1,5 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 
 from jose import jwt
@@ -5,7 +7,36 @@ from passlib.context import CryptContext
 
 from app.core.config import settings
 
-pwd_context = CryptContext(schemes=["pbkdf2_sha256", "bcrypt"], deprecated="auto")
+_SCHEMES = ["pbkdf2_sha256", "bcrypt"]
+
+# min_rounds == default_rounds makes verify_and_update flag hashes made with fewer rounds
+pwd_context = CryptContext(
+    schemes=[settings.PASSWORD_SCHEME] + [s for s in _SCHEMES if s != settings.PASSWORD_SCHEME],
+    default=settings.PASSWORD_SCHEME,
+    deprecated="auto",
+    pbkdf2_sha256__default_rounds=settings.PASSWORD_PBKDF2_ROUNDS,
+    pbkdf2_sha256__min_rounds=settings.PASSWORD_PBKDF2_ROUNDS,
+    bcrypt__default_rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+)
+
+# Hashing is pure CPU (hashlib and bcrypt release the GIL), so it runs on a small
+# dedicated pool; its size caps how many hashes run at once per worker process.
+_hash_executor: ThreadPoolExecutor | None = None
+
+
+def _get_hash_executor() -> ThreadPoolExecutor:
+    global _hash_executor
+    if _hash_executor is None:
+        _hash_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="pwhash")
+    return _hash_executor
+
+
+def shutdown_hash_executor() -> None:
+    global _hash_executor
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=False, cancel_futures=True)
+        _hash_executor = None
 
 
 def hash_password(password: str) -> str:
@@ -20,7 +51,24 @@ def verify_password(password: str, password_hash: str) -> bool:
     return pwd_context.verify(password, password_hash)
 
 
-def create_access_token(subject: str) -> str:
+def verify_and_update(password: str, password_hash: str) -> tuple[bool, str | None]:
+    # (valid, new_hash); new_hash is set when the stored hash uses outdated parameters
+    if password is None or not password_hash:
+        return False, None
+    return pwd_context.verify_and_update(password, password_hash)
+
+
+async def hash_password_async(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(_get_hash_executor(), hash_password, password)
+
+
+async def verify_and_update_async(password: str, password_hash: str) -> tuple[bool, str | None]:
+    return await asyncio.get_running_loop().run_in_executor(
+        _get_hash_executor(), verify_and_update, password, password_hash
+    )
+
+
+def create_access_token(subject: str, claims: dict | None = None) -> str:
     expire = datetime.now(timezone.utc) + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode = {"sub": subject, "exp": expire}
+    to_encode = {**(claims or {}), "sub": subject, "exp": expire}
     return jwt.encode(to_encode, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
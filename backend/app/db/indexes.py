@@ -0,0 +1,175 @@
+import argparse
+import asyncio
+import logging
+import sys
+from datetime import datetime
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+logger = logging.getLogger(__name__)
+
+INDEXES: dict[str, list[IndexModel]] = {
+    "transactions": [
+        IndexModel([("user_id", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)], name="user_date_id"),
+        IndexModel(
+            [("user_id", ASCENDING), ("category", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)],
+            name="user_category_date_id",
+        ),
+        IndexModel(
+            [("user_id", ASCENDING), ("source", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)],
+            name="user_source_date_id",
+        ),
+    ],
+    "monthly_rollups": [
+        IndexModel([("user_id", ASCENDING), ("month", ASCENDING), ("category", ASCENDING)], unique=True, name="user_month_category"),
+    ],
+    "users": [
+        IndexModel([("email", ASCENDING)], unique=True, name="email_unique"),
+    ],
+    "rules": [
+        IndexModel([("user_id", ASCENDING), ("priority", ASCENDING), ("created_at", ASCENDING)], name="user_priority"),
+    ],
+    "jobs": [
+        IndexModel([("kind", ASCENDING), ("status", ASCENDING), ("created_at", ASCENDING)], name="kind_status_created"),
+    ],
+    "corrections": [
+        IndexModel([("folded_at", ASCENDING), ("created_at", ASCENDING)], name="folded_created"),
+        IndexModel([("folding_by", ASCENDING)], name="folding_by"),
+    ],
+    "user_overrides": [
+        IndexModel([("user_id", ASCENDING), ("updated_at", DESCENDING)], name="user_updated"),
+    ],
+    "categorize_cache": [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0, name="expires_at_ttl"),
+    ],
+}
+
+
+async def ensure_indexes(db) -> None:
+    for collection, models in INDEXES.items():
+        try:
+            await db[collection].create_indexes(models)
+        except Exception:
+            # e.g. duplicate emails already stored; keep serving and let the check command report it
+            logger.exception("Could not create indexes on %s", collection)
+
+
+# One representative query per router code path, run through explain() by the check
+# command. Keep these in step with the queries in app/routers and app/services.
+_SAMPLE_USER = "explain-check"
+_START, _END = datetime(2025, 1, 1), datetime(2025, 2, 1)
+_AFTER = {"$or": [{"date": {"$lt": _END}}, {"date": _END, "_id": {"$lt": "explain-check"}}]}
+
+
+def _find(collection: str, filter: dict, sort: list | None = None, limit: int = 0) -> dict:
+    cmd = {"find": collection, "filter": filter}
+    if sort:
+        cmd["sort"] = dict(sort)
+    if limit:
+        cmd["limit"] = limit
+    return cmd
+
+
+def _aggregate(collection: str, pipeline: list[dict]) -> dict:
+    return {"aggregate": collection, "pipeline": pipeline, "cursor": {}}
+
+
+QUERIES: dict[str, dict] = {
+    "transactions.recent": _find("transactions", {"user_id": _SAMPLE_USER}, [("date", -1), ("_id", -1)], limit=20),
+    "transactions.list": _find(
+        "transactions", {"user_id": _SAMPLE_USER, **_AFTER}, [("date", -1), ("_id", -1)], limit=51
+    ),
+    "transactions.list.month_category": _find(
+        "transactions",
+        {"user_id": _SAMPLE_USER, "category": "Groceries", "date": {"$gte": _START, "$lt": _END}, **_AFTER},
+        [("date", -1), ("_id", -1)],
+        limit=51,
+    ),
+    "transactions.list.source": _find(
+        "transactions", {"user_id": _SAMPLE_USER, "source": "ml", **_AFTER}, [("date", -1), ("_id", -1)], limit=51
+    ),
+    "transactions.month_summary": _find("monthly_rollups", {"user_id": _SAMPLE_USER, "month": "2025-01"}),
+    "analytics.dashboard": _find("monthly_rollups", {"user_id": _SAMPLE_USER, "month": "2025-01"}),
+    "analytics.trend": _aggregate(
+        "monthly_rollups",
+        [
+            {"$match": {"user_id": _SAMPLE_USER}},
+            {"$group": {"_id": "$month", "total": {"$sum": "$total"}}},
+            {"$sort": {"_id": 1}},
+        ],
+    ),
+    "analytics.anomalies.baselines": _aggregate(
+        "transactions",
+        [
+            {"$match": {"user_id": _SAMPLE_USER, "date": {"$gte": _START, "$lt": _END}}},
+            {"$group": {"_id": "$category", "mean": {"$avg": "$amount"}, "std": {"$stdDevPop": "$amount"}}},
+        ],
+    ),
+    "analytics.anomalies": _find(
+        "transactions",
+        {
+            "user_id": _SAMPLE_USER,
+            "date": {"$gte": _START, "$lt": _END},
+            "$or": [{"category": "Groceries", "amount": {"$gte": 100.0}}, {"category": "Rent", "amount": {"$gte": 900.0}}],
+        },
+    ),
+    "export.transactions_csv": _find(
+        "transactions", {"user_id": _SAMPLE_USER, "date": {"$gte": _START, "$lt": _END}}, [("date", -1)]
+    ),
+    "insights.summary": _find("monthly_rollups", {"user_id": _SAMPLE_USER, "month": "2025-01"}),
+    "auth.login": _find("users", {"email": "explain-check@example.com"}),
+    "rules.list": _find("rules", {"user_id": _SAMPLE_USER}, [("priority", 1), ("created_at", 1)]),
+    "rules.overrides": _find("user_overrides", {"user_id": _SAMPLE_USER}, [("updated_at", -1)], limit=5000),
+    "corrections.fold": _find(
+        "corrections",
+        {"folded_at": None, "$or": [{"folding_until": None}, {"folding_until": {"$lt": _START}}]},
+        [("created_at", 1)],
+        limit=10000,
+    ),
+    "corrections.claimed": _find("corrections", {"folding_by": "explain-check", "folded_at": None}, [("created_at", 1)]),
+    "jobs.resumable": _find(
+        "jobs",
+        {"kind": "ingest", "$or": [{"status": "queued"}, {"status": "running", "heartbeat_at": {"$lt": _START}}]},
+        [("created_at", 1)],
+    ),
+}
+
+
+def _has_collscan(plan) -> bool:
+    if isinstance(plan, dict):
+        if plan.get("stage") == "COLLSCAN":
+            return True
+        return any(_has_collscan(v) for v in plan.values())
+    if isinstance(plan, list):
+        return any(_has_collscan(v) for v in plan)
+    return False
+
+
+async def check_query_plans(db) -> list[str]:
+    collscans = []
+    for name, cmd in QUERIES.items():
+        explain = await db.command({"explain": cmd, "verbosity": "queryPlanner"})
+        if _has_collscan(explain):
+            collscans.append(name)
+    return collscans
+
+
+async def _main(check: bool) -> int:
+    from app.db.mongo import get_db
+
+    db = get_db()
+    await ensure_indexes(db)
+    if not check:
+        return 0
+
+    collscans = await check_query_plans(db)
+    for name in QUERIES:
+        print(f"{'COLLSCAN' if name in collscans else 'ok':8} {name}")
+    return 1 if collscans else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create MongoDB indexes and verify query plans")
+    parser.add_argument("--check", action="store_true", help="explain() every router query and fail on COLLSCAN")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_main(args.check)))
@@ -1,14 +1,37 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
 
 from app.core.config import settings
+from app.core.metrics import mongo_command_seconds
 
 _client: AsyncIOMotorClient | None = None
 
 
+class MongoCommandListener(monitoring.CommandListener):
+    # Only started events carry the command, so remember its collection until it finishes
+    def __init__(self):
+        self._pending: dict[int, tuple[str, str]] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        target = event.command.get("collection" if event.command_name == "getMore" else event.command_name)
+        self._pending[event.request_id] = (target if isinstance(target, str) else "-", event.command_name)
+
+    def _finish(self, event, outcome: str) -> None:
+        collection, command = self._pending.pop(event.request_id, ("-", event.command_name))
+        mongo_command_seconds.observe(event.duration_micros / 1e6, collection, command, outcome)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._finish(event, "ok")
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._finish(event, "error")
+
+
 def get_client() -> AsyncIOMotorClient:
     global _client
     if _client is None:
-        _client = AsyncIOMotorClient(settings.MONGODB_URI)
+        listeners = [MongoCommandListener()] if settings.METRICS_ENABLED else []
+        _client = AsyncIOMotorClient(settings.MONGODB_URI, event_listeners=listeners)
     return _client
 
 
@@ -1,10 +1,76 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 from app.core.config import settings
-from app.routers import auth, transactions, model, analytics, insights, export
+from app.core.deps import auth_stats
+from app.core.metrics import HTTPMetricsMiddleware, render_metrics
+from app.core.security import shutdown_hash_executor
+from app.db.indexes import ensure_indexes
+from app.db.mongo import get_db
+from app.ml.model_store import registry, warm_model
+from app.routers import auth, transactions, model, analytics, insights, export, rules
+from app.services.categorizer import cache_stats, ml_batch_stats
+from app.services.corrections import fold_forever
+from app.services.gemini import scheduler as llm_scheduler
+from app.services.inference import InferenceBusy, inference
+from app.services.ingest import ingest_pool
+from app.services.llm import llm_client_stats
+from app.services.reports import shutdown_executor as shutdown_report_executor
+from app.services.rollups import backfill_rollups
+from app.services.training import fail_abandoned_jobs_forever, shutdown_executor as shutdown_training_executor
+
+logger = logging.getLogger(__name__)
+
+
+async def _warm_model() -> None:
+    try:
+        if inference.kind == "thread":
+            await asyncio.to_thread(registry.warm)
+        else:
+            # The API process only needs the model's version, read from disk without
+            # loading it. Worker warmups are submitted together: the pool spawns a process per submit while none is
+            # idle, whereas sequential awaits would keep reusing the first one
+            await asyncio.gather(*(inference.run(warm_model, wait=True) for _ in range(inference.workers)))
+    except Exception:
+        logger.exception("Model warmup failed; it will load on first use")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warmup = asyncio.create_task(_warm_model()) if settings.MODEL_WARMUP else None
+    await ensure_indexes(get_db())
+    try:
+        if await backfill_rollups(get_db()):
+            logger.info("Backfilled monthly rollups from transactions")
+    except Exception:
+        logger.exception("Monthly rollup backfill failed; it will be retried on the next start")
+    await ingest_pool.start(get_db())
+    folder = asyncio.create_task(fold_forever(get_db()))
+    reaper = asyncio.create_task(fail_abandoned_jobs_forever(get_db()))
+    yield
+    if warmup is not None and not warmup.done():
+        warmup.cancel()
+    folder.cancel()
+    reaper.cancel()
+    await ingest_pool.stop()
+    shutdown_training_executor()
+    shutdown_report_executor()
+    shutdown_hash_executor()
+    inference.shutdown()
+
+
+app = FastAPI(title="Personal Expense Categorization Assistant", lifespan=lifespan)
+
+
+@app.exception_handler(InferenceBusy)
+async def inference_busy(request: Request, exc: InferenceBusy):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
 
-app = FastAPI(title="Personal Expense Categorization Assistant")
 
 origins = [o.strip() for o in settings.CORS_ORIGINS.split(",") if o.strip()]
 
@@ -15,6 +81,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"]
 )
+if settings.METRICS_ENABLED:
+    app.add_middleware(HTTPMetricsMiddleware)
 
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
 app.include_router(transactions.router, prefix="/api/transactions", tags=["transactions"])
@@ -22,8 +90,28 @@ app.include_router(model.router, prefix="/api/model", tags=["model"])
 app.include_router(analytics.router, prefix="/api/analytics", tags=["analytics"])
 app.include_router(insights.router, prefix="/api/insights", tags=["insights"])
 app.include_router(export.router, prefix="/api/export", tags=["export"])
+app.include_router(rules.router, prefix="/api/rules", tags=["rules"])
 
 
 @app.get("/api/health")
 def health():
     return {"status": "ok"}
+
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/api/stats")
+def stats():
+    return {
+        "auth": auth_stats(),
+        "model": registry.stats(),
+        "categorize_cache": cache_stats(),
+        "llm": llm_scheduler.stats(),
+        "llm_client": llm_client_stats(),
+        "ingest": ingest_pool.stats(),
+        "inference": inference.stats(),
+        "ml_batching": ml_batch_stats(),
+    }
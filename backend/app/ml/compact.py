@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import shutil
+
+import numpy as np
+
+from app.ml.scorer import is_ovr, probabilities
+
+# Compact model export: the TF-IDF vocabulary, idf vector and LR coefficients as
+# plain .npy files that workers open with mmap_mode="r", so every process on a node
+# shares one page-cache copy instead of unpickling its own Pipeline and vocabulary
+# dict. Terms are stored sorted as fixed-width UTF-8 bytes and looked up with
+# searchsorted; coefficient rows follow the same order.
+#
+#   <MODEL_DIR>/compact/<version>/{meta.json,terms.npy,idf.npy,coef.npy,intercept.npy}
+#   <MODEL_DIR>/compact/CURRENT   name of the live version, replaced atomically
+
+FORMAT_VERSION = 1
+
+
+def compact_root(model_dir: str) -> str:
+    return os.path.join(model_dir, "compact")
+
+
+def pointer_path(model_dir: str) -> str:
+    return os.path.join(compact_root(model_dir), "CURRENT")
+
+
+def _check_supported(vectorizer, clf) -> None:
+    if type(vectorizer).__name__ != "TfidfVectorizer" or type(clf).__name__ != "LogisticRegression":
+        raise ValueError("Compact export supports TfidfVectorizer + LogisticRegression pipelines only")
+    params = vectorizer.get_params()
+    unsupported = {
+        "analyzer": params["analyzer"] != "word",
+        "tokenizer": params["tokenizer"] is not None,
+        "preprocessor": params["preprocessor"] is not None,
+        "stop_words": params["stop_words"] is not None,
+        "strip_accents": params["strip_accents"] is not None,
+        "norm": params["norm"] not in ("l1", "l2", None),
+    }
+    bad = [name for name, flag in unsupported.items() if flag]
+    if bad:
+        raise ValueError(f"Compact export does not support vectorizer settings: {', '.join(bad)}")
+
+
+def export_compact(pipeline, labels: list[str], model_dir: str, version: str) -> str:
+    vectorizer, clf = pipeline.steps[0][1], pipeline.steps[1][1]
+    _check_supported(vectorizer, clf)
+
+    vocab = vectorizer.vocabulary_
+    # Python str order is code point order, which is also UTF-8 byte order
+    terms = sorted(vocab)
+    order = np.fromiter((vocab[t] for t in terms), dtype=np.int64, count=len(terms))
+    encoded = [t.encode("utf-8") for t in terms]
+    width = max((len(t) for t in encoded), default=1)
+
+    root = compact_root(model_dir)
+    final = os.path.join(root, version)
+    tmp = f"{final}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    np.save(os.path.join(tmp, "terms.npy"), np.array(encoded, dtype=f"S{width}"))
+    idf = vectorizer.idf_ if vectorizer.use_idf else np.ones(len(terms))
+    np.save(os.path.join(tmp, "idf.npy"), np.asarray(idf, dtype=np.float32)[order])
+    np.save(
+        os.path.join(tmp, "coef.npy"),
+        np.ascontiguousarray(np.asarray(clf.coef_, dtype=np.float32).T[order]),
+    )
+    np.save(os.path.join(tmp, "intercept.npy"), np.asarray(clf.intercept_, dtype=np.float64))
+    params = vectorizer.get_params()
+    meta = {
+        "format": FORMAT_VERSION,
+        "version": version,
+        "labels": [str(label) for label in labels],
+        "classes": [str(c) for c in clf.classes_],
+        "ovr": is_ovr(clf),
+        "lowercase": params["lowercase"],
+        "token_pattern": params["token_pattern"],
+        "ngram_range": list(params["ngram_range"]),
+        "binary": params["binary"],
+        "sublinear_tf": params["sublinear_tf"],
+        "use_idf": params["use_idf"],
+        "norm": params["norm"],
+    }
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(meta, f)
+
+    shutil.rmtree(final, ignore_errors=True)
+    os.replace(tmp, final)
+    pointer_tmp = f"{pointer_path(model_dir)}.{os.getpid()}.tmp"
+    with open(pointer_tmp, "w") as f:
+        f.write(version)
+    os.replace(pointer_tmp, pointer_path(model_dir))
+    _prune(root, keep={version})
+    return final
+
+
+def _prune(root: str, keep: set[str]) -> None:
+    # Workers still mapping an older version keep their pages after the unlink
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if os.path.isdir(path) and name not in keep and not name.endswith(".tmp"):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def current_version_dir(model_dir: str) -> str | None:
+    try:
+        with open(pointer_path(model_dir)) as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+    path = os.path.join(compact_root(model_dir), version)
+    return path if os.path.isdir(path) else None
+
+
+class CompactScorer:
+    # Re-implements TfidfVectorizer.transform for the supported settings and scores
+    # the result against the mmapped float32 coefficients; probabilities agree with
+    # the joblib model to float32 precision.
+    def __init__(self, path: str):
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.terms = np.load(os.path.join(path, "terms.npy"), mmap_mode="r")
+        self.idf = np.load(os.path.join(path, "idf.npy"), mmap_mode="r")
+        self.weights = np.load(os.path.join(path, "coef.npy"), mmap_mode="r")
+        self.intercept = np.load(os.path.join(path, "intercept.npy"))
+        self.classes = np.asarray(self.meta["classes"])
+        self.labels = self.meta["labels"]
+        self.version = self.meta["version"]
+        self.ovr = self.meta["ovr"]
+        self._token = re.compile(self.meta["token_pattern"])
+        self._ngrams = tuple(self.meta["ngram_range"])
+        self._width = self.terms.dtype.itemsize
+
+    def _analyze(self, text: str) -> list[str]:
+        if self.meta["lowercase"]:
+            text = text.lower()
+        tokens = self._token.findall(text)
+        min_n, max_n = self._ngrams
+        grams = list(tokens) if min_n == 1 else []
+        for n in range(max(min_n, 2), min(max_n, len(tokens)) + 1):
+            grams.extend(" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+        return grams
+
+    def decision_function(self, descriptions: list[str]) -> np.ndarray:
+        n_docs, n_terms = len(descriptions), len(self.terms)
+        scores = np.tile(self.intercept, (n_docs, 1))
+        doc_ids: list[int] = []
+        keys: list[bytes] = []
+        for doc, text in enumerate(descriptions):
+            for gram in self._analyze(text or ""):
+                key = gram.encode("utf-8")
+                # Longer than every stored term, so it cannot be in the vocabulary
+                if len(key) <= self._width:
+                    doc_ids.append(doc)
+                    keys.append(key)
+        if not keys or not n_terms:
+            return scores
+
+        queries = np.array(keys, dtype=self.terms.dtype)
+        pos = np.minimum(np.searchsorted(self.terms, queries), n_terms - 1)
+        hit = self.terms[pos] == queries
+        pairs = np.asarray(doc_ids, dtype=np.int64)[hit] * n_terms + pos[hit]
+        pairs, counts = np.unique(pairs, return_counts=True)
+        docs, idx = np.divmod(pairs, n_terms)
+
+        tf = np.ones(len(counts)) if self.meta["binary"] else counts.astype(np.float64)
+        if self.meta["sublinear_tf"]:
+            tf = np.log(tf) + 1
+        values = tf * self.idf[idx] if self.meta["use_idf"] else tf
+        norm = self.meta["norm"]
+        if norm:
+            per_doc = np.bincount(docs, weights=values**2 if norm == "l2" else np.abs(values), minlength=n_docs)
+            if norm == "l2":
+                per_doc = np.sqrt(per_doc)
+            per_doc[per_doc == 0] = 1.0
+            values = values / per_doc[docs]
+        np.add.at(scores, docs, values[:, None] * self.weights[idx])
+        return scores
+
+    def predict_proba(self, descriptions: list[str]) -> np.ndarray:
+        return probabilities(self.decision_function(descriptions), self.ovr)
+
+
+if __name__ == "__main__":
+    from app.core.config import settings
+    from app.ml.model_store import load_joblib_artifacts
+
+    parser = argparse.ArgumentParser(description="Export the current joblib model in the compact mmap format")
+    parser.add_argument("--export", action="store_true", required=True)
+    parser.parse_args()
+    artifacts = load_joblib_artifacts()
+    if artifacts is None:
+        raise SystemExit("No joblib model found")
+    print(export_compact(artifacts.pipeline, artifacts.labels, settings.MODEL_DIR, artifacts.version))
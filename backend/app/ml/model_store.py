@@ -1,43 +1,255 @@
+import hashlib
+import io
+import logging
 import os
+import threading
+import time
 from dataclasses import dataclass
 
-import joblib
-
 from app.core.config import settings
+from app.core.metrics import model_load_seconds
+
+logger = logging.getLogger(__name__)
 
 
 @dataclass
 class ModelArtifacts:
     pipeline: object
     labels: list[str]
+    version: str | None = None
+    scorer: object | None = None
 
 
-def artifacts_path() -> str:
+def joblib_path() -> str:
     # Try custom model first, then fallback to default
     custom_path = os.path.join(settings.MODEL_DIR, "expense_model.joblib")
     default_path = os.path.join(settings.MODEL_DIR, "model.joblib")
     return custom_path if os.path.exists(custom_path) else default_path
 
 
+def artifacts_path() -> str:
+    # The file whose changes trigger a reload: the compact export's pointer when that
+    # format is enabled and exported, the joblib file otherwise
+    if settings.MODEL_FORMAT == "compact":
+        from app.ml.compact import pointer_path
+
+        pointer = pointer_path(settings.MODEL_DIR)
+        if os.path.exists(pointer):
+            return pointer
+    return joblib_path()
+
+
+def _file_version(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
+
 def load_artifacts() -> ModelArtifacts | None:
-    path = artifacts_path()
+    if settings.MODEL_FORMAT == "compact":
+        from app.ml.compact import CompactScorer, current_version_dir
+
+        path = current_version_dir(settings.MODEL_DIR)
+        if path is not None:
+            scorer = CompactScorer(path)
+            return ModelArtifacts(pipeline=None, labels=scorer.labels, version=scorer.version, scorer=scorer)
+    return load_joblib_artifacts()
+
+
+def load_joblib_artifacts() -> ModelArtifacts | None:
+    path = joblib_path()
     if not os.path.exists(path):
         return None
-    data = joblib.load(path)
+    with open(path, "rb") as f:
+        raw = f.read()
+    version = hashlib.sha256(raw).hexdigest()[:12]
+    # Unpickling pulls in sklearn/numpy; deferred so API startup does not pay for them
+    import joblib
+
+    from app.ml.scorer import build_scorer
+
+    data = joblib.load(io.BytesIO(raw))
     # Handle both formats: dict with pipeline/labels or direct pipeline
     if isinstance(data, dict) and "pipeline" in data and "labels" in data:
-        return ModelArtifacts(pipeline=data["pipeline"], labels=data["labels"])
+        pipeline = data["pipeline"]
+        return ModelArtifacts(pipeline=pipeline, labels=data["labels"], version=version, scorer=build_scorer(pipeline))
     elif hasattr(data, 'predict'):  # Direct pipeline object
         # Try to infer labels from the model
         if hasattr(data, 'classes_'):
             labels = list(data.classes_)
         else:
             labels = []  # Will be populated during first use
-        return ModelArtifacts(pipeline=data, labels=labels)
+        return ModelArtifacts(pipeline=data, labels=labels, version=version, scorer=build_scorer(data))
     else:
         return None
 
 
-def save_artifacts(pipeline: object, labels: list[str]) -> None:
+def save_artifacts(pipeline: object, labels: list[str]) -> str:
     os.makedirs(settings.MODEL_DIR, exist_ok=True)
-    joblib.dump({"pipeline": pipeline, "labels": labels}, artifacts_path())
+    path = joblib_path()
+    # Write to a sibling file and rename so readers in other workers never see a partial model
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    import joblib
+
+    joblib.dump({"pipeline": pipeline, "labels": labels}, tmp_path)
+    os.replace(tmp_path, path)
+    saved_format = "joblib"
+    if settings.MODEL_FORMAT == "compact":
+        from app.ml.compact import export_compact, pointer_path
+
+        try:
+            export_compact(pipeline, labels, settings.MODEL_DIR, _file_version(path))
+            saved_format = "compact"
+        except ValueError:
+            logger.warning("Model cannot be exported in the compact format; serving the joblib file", exc_info=True)
+            # Do not keep serving an older compact export
+            try:
+                os.unlink(pointer_path(settings.MODEL_DIR))
+            except FileNotFoundError:
+                pass
+    registry.invalidate()
+    return saved_format
+
+
+# Process-wide resident model. The artifact file is re-stat'ed at most every
+# check_interval seconds and reloaded when its path, mtime or size changes; readers
+# always see either the old or the new artifacts, never a partially loaded model.
+class ModelRegistry:
+    def __init__(self, check_interval: float):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._artifacts: ModelArtifacts | None = None
+        self._stamp: tuple | None = None
+        self._checked_at: float | None = None
+        self.loads = 0
+        self.hits = 0
+        self.misses = 0
+        self.load_seconds: float | None = None
+        self.loaded_at: float | None = None
+        # Version of the artifacts on disk, tracked separately from the loaded model
+        self._version: str | None = None
+        self._version_stamp: tuple | None = None
+        self._version_checked_at: float | None = None
+
+    def _refresh(self) -> None:
+        now = time.monotonic()
+        if self._checked_at is None or now - self._checked_at >= self.check_interval:
+            self._checked_at = now
+            if self._stamp != _file_stamp():
+                self.reload()
+
+    def check_due(self) -> bool:
+        # True when the next current_version() will stat (and maybe hash) the file
+        return (
+            self._version_checked_at is None or time.monotonic() - self._version_checked_at >= self.check_interval
+        )
+
+    def current_version(self) -> str | None:
+        # The version of the model on disk without loading it, so processes that only
+        # key caches on it (the API when inference runs out of process) never unpickle
+        now = time.monotonic()
+        if self._version_checked_at is not None and now - self._version_checked_at < self.check_interval:
+            return self._version
+        self._version_checked_at = now
+        stamp = _file_stamp()
+        if stamp != self._version_stamp:
+            artifacts = self._artifacts
+            if stamp is not None and stamp == self._stamp and artifacts is not None:
+                self._version = artifacts.version
+            else:
+                self._version = _stamp_version(stamp)
+            self._version_stamp = stamp
+        return self._version
+
+    def get(self) -> ModelArtifacts | None:
+        self._refresh()
+        artifacts = self._artifacts
+        if artifacts is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return artifacts
+
+    def invalidate(self) -> None:
+        # Force the next get() to reload, without paying for the load in processes that never predict
+        self._stamp = None
+        self._checked_at = None
+        self._version_stamp = None
+        self._version_checked_at = None
+
+    def reload(self) -> ModelArtifacts | None:
+        with self._lock:
+            stamp = _file_stamp()
+            if stamp is not None and stamp == self._stamp and self._artifacts is not None:
+                # Another thread (e.g. the startup warmup) loaded this file while we waited
+                self._checked_at = time.monotonic()
+                return self._artifacts
+            started = time.perf_counter()
+            artifacts = load_artifacts() if stamp is not None else None
+            self.load_seconds = time.perf_counter() - started
+            if stamp is not None:
+                model_load_seconds.observe(self.load_seconds)
+            self.loaded_at = time.time()
+            self.loads += 1
+            self._artifacts = artifacts
+            self._stamp = stamp
+            self._checked_at = time.monotonic()
+            return artifacts
+
+    def warm(self) -> None:
+        # Load the model and run one prediction so the first request pays for neither
+        artifacts = self.reload()
+        if artifacts is not None and artifacts.scorer is not None:
+            artifacts.scorer.predict_proba(["warmup"])
+
+    def stats(self) -> dict:
+        artifacts = self._artifacts
+        return {
+            "loaded": artifacts is not None,
+            "version": artifacts.version if artifacts else None,
+            "path": self._stamp[0] if self._stamp else None,
+            "loaded_at": self.loaded_at,
+            "load_seconds": self.load_seconds,
+            "loads": self.loads,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def _file_stamp() -> tuple | None:
+    path = artifacts_path()
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (path, st.st_mtime_ns, st.st_size)
+
+
+def _stamp_version(stamp: tuple | None) -> str | None:
+    # Same value as ModelArtifacts.version: the compact pointer names the export, which
+    # is itself named after the joblib file's content hash
+    if stamp is None:
+        return None
+    path = stamp[0]
+    try:
+        if settings.MODEL_FORMAT == "compact" and os.path.basename(path) == "CURRENT":
+            with open(path) as f:
+                return f.read().strip() or None
+        return _file_version(path)
+    except FileNotFoundError:
+        return None
+
+
+registry = ModelRegistry(check_interval=settings.MODEL_RELOAD_INTERVAL_SECONDS)
+
+
+def warm_model() -> None:
+    # Picklable entry point for warming the registry of an inference worker process
+    registry.warm()
+
+
+def model_labels() -> tuple[str | None, list[str]]:
+    # Picklable: the version and labels of the model an inference worker scores with
+    artifacts = registry.get()
+    if artifacts is None:
+        return None, []
+    return artifacts.version, list(artifacts.labels or [])
@@ -1,24 +1,87 @@
 import re
+from dataclasses import dataclass
 
+_WORD = re.compile(r"\w+")
 
-_RULES: list[tuple[str, re.Pattern[str]]] = [
-    ("Fuel", re.compile(r"\b(fuel|petrol|diesel|gas\s*station)\b", re.I)),
-    ("Rent", re.compile(r"\b(rent|landlord|lease)\b", re.I)),
-    ("Groceries", re.compile(r"\b(grocery|supermarket|market|walmart|costco|aldi)\b", re.I)),
-    ("Restaurant", re.compile(r"\b(restaurant|cafe|coffee|pizza|burger|dinner|lunch)\b", re.I)),
-    ("EMI", re.compile(r"\b(emi|installment|loan\s*payment|mortgage)\b", re.I)),
-    ("Transport", re.compile(r"\b(uber|lyft|taxi|bus|metro|train|transport)\b", re.I)),
-    ("Phone", re.compile(r"\b(phone|mobile|recharge|top\s*up|airtime)\b", re.I)),
+
+@dataclass(frozen=True)
+class Rule:
+    label: str
+    keyword: str
+    user: bool = False
+    # Matches only a description whose words are exactly the keyword's (user corrections)
+    exact: bool = False
+
+
+# Built-in rules in priority order. Multi-word keywords match consecutive words, so
+# "gas station" also matches "GAS   STATION"; the glued spellings cover "gasstation".
+_BUILTIN_RULES: list[tuple[str, list[str]]] = [
+    ("Fuel", ["fuel", "petrol", "diesel", "gas station", "gasstation"]),
+    ("Rent", ["rent", "landlord", "lease"]),
+    ("Groceries", ["grocery", "supermarket", "market", "walmart", "costco", "aldi"]),
+    ("Restaurant", ["restaurant", "cafe", "coffee", "pizza", "burger", "dinner", "lunch"]),
+    ("EMI", ["emi", "installment", "loan payment", "loanpayment", "mortgage"]),
+    ("Transport", ["uber", "lyft", "taxi", "bus", "metro", "train", "transport"]),
+    ("Phone", ["phone", "mobile", "recharge", "top up", "topup", "airtime"]),
 ]
 
 
-def apply_rules(description: str) -> tuple[str, float, str, str] | None:
+def keyword_tokens(keyword: str) -> tuple[str, ...]:
+    return tuple(_WORD.findall(keyword.lower()))
+
+
+class RuleEngine:
+    # Keyword rules compiled into a single word-sequence index. A description is
+    # tokenized once and every word n-gram (up to the longest keyword) is looked up,
+    # so matching costs O(words) regardless of how many rules there are. Among all
+    # hits the rule that comes first in the list wins. Exact rules are looked up by
+    # the whole word sequence and take precedence over keyword hits.
+    def __init__(self, rules: list[Rule]):
+        self._index: dict[tuple[str, ...], tuple[int, Rule]] = {}
+        self._exact: dict[tuple[str, ...], Rule] = {}
+        for priority, rule in enumerate(rules):
+            key = keyword_tokens(rule.keyword)
+            if not key:
+                continue
+            if rule.exact:
+                self._exact.setdefault(key, rule)
+            elif key not in self._index:
+                self._index[key] = (priority, rule)
+        self._max_words = max((len(k) for k in self._index), default=0)
+        self.size = len(self._index) + len(self._exact)
+
+    def match(self, text: str) -> Rule | None:
+        words = _WORD.findall(text.lower())
+        if self._exact:
+            exact = self._exact.get(tuple(words))
+            if exact is not None:
+                return exact
+        best: tuple[int, Rule] | None = None
+        for i in range(len(words)):
+            for n in range(1, min(self._max_words, len(words) - i) + 1):
+                hit = self._index.get(tuple(words[i:i + n]))
+                if hit is not None and (best is None or hit[0] < best[0]):
+                    best = hit
+                    if best[0] == 0:
+                        return best[1]
+        return best[1] if best is not None else None
+
+
+BUILTIN_RULES: list[Rule] = [Rule(label, kw) for label, keywords in _BUILTIN_RULES for kw in keywords]
+
+default_engine = RuleEngine(BUILTIN_RULES)
+
+
+def apply_rules(description: str, engine: RuleEngine | None = None) -> tuple[str, float, str, str] | None:
     desc = (description or "").strip()
     if not desc:
         return None
 
-    for label, pattern in _RULES:
-        if pattern.search(desc):
-            return (label, 0.95, "rules", f"Matched rule: {label}")
-
-    return None
+    rule = (engine or default_engine).match(desc)
+    if rule is None:
+        return None
+    if rule.exact:
+        return (rule.label, 0.99, "correction", "Matches your earlier correction")
+    if rule.user:
+        return (rule.label, 0.99, "rules", f"Matched your rule: {rule.keyword}")
+    return (rule.label, 0.95, "rules", f"Matched rule: {rule.label}")
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import numpy as np
+
+
+def _expit(x: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def _softmax(x: np.ndarray) -> np.ndarray:
+    x = x - x.max(axis=1, keepdims=True)
+    np.exp(x, out=x)
+    x /= x.sum(axis=1, keepdims=True)
+    return x
+
+
+def probabilities(scores: np.ndarray, ovr: bool) -> np.ndarray:
+    # LogisticRegression.predict_proba from decision scores
+    if scores.shape[1] == 1:
+        # Binary models have a single column; multinomial binary uses [-d, d] softmax == expit(2d)
+        p = _expit(scores[:, 0] if ovr else 2 * scores[:, 0])
+        return np.column_stack([1 - p, p])
+    if ovr:
+        p = _expit(scores)
+        p /= p.sum(axis=1, keepdims=True)
+        return p
+    return _softmax(scores)
+
+
+def is_ovr(clf) -> bool:
+    # Whether a fitted LogisticRegression scores classes one-vs-rest (else multinomial)
+    multi_class = getattr(clf, "multi_class", "auto")
+    return multi_class in ("ovr", "warn") or (
+        multi_class in ("auto", "deprecated") and (len(clf.classes_) <= 2 or getattr(clf, "solver", None) == "liblinear")
+    )
+
+
+class PipelineScorer:
+    # Fallback for pipelines we cannot take apart: one predict_proba call per batch.
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+        self.classes = np.asarray(pipeline.classes_)
+
+    def predict_proba(self, descriptions: list[str]) -> np.ndarray:
+        return np.asarray(self.pipeline.predict_proba(descriptions))
+
+
+class LinearScorer:
+    # Vectorizer + linear classifier scored directly: the TF-IDF transform runs once
+    # and the sparse document matrix is multiplied with a precomputed, C-contiguous
+    # (features x classes) weight matrix, skipping the Pipeline/estimator dispatch.
+    # Probabilities match LogisticRegression.predict_proba.
+    def __init__(self, vectorizer, weights: np.ndarray, intercept: np.ndarray, classes: np.ndarray, ovr: bool):
+        self.vectorizer = vectorizer
+        self.weights = weights
+        self.intercept = intercept
+        self.classes = classes
+        self.ovr = ovr
+
+    @classmethod
+    def from_pipeline(cls, pipeline) -> LinearScorer | None:
+        steps = getattr(pipeline, "steps", None)
+        if not steps or len(steps) != 2:
+            return None
+        vectorizer, clf = steps[0][1], steps[1][1]
+        if not hasattr(vectorizer, "transform") or not all(
+            hasattr(clf, attr) for attr in ("coef_", "intercept_", "classes_", "predict_proba")
+        ):
+            return None
+        if type(clf).__name__ != "LogisticRegression":
+            return None
+
+        classes = np.asarray(clf.classes_)
+        ovr = is_ovr(clf)
+        weights = np.ascontiguousarray(np.asarray(clf.coef_, dtype=np.float64).T)
+        intercept = np.asarray(clf.intercept_, dtype=np.float64)
+        return cls(vectorizer, weights, intercept, classes, ovr)
+
+    def decision_function(self, descriptions: list[str]) -> np.ndarray:
+        X = self.vectorizer.transform(descriptions)
+        return np.asarray(X @ self.weights) + self.intercept
+
+    def predict_proba(self, descriptions: list[str]) -> np.ndarray:
+        return probabilities(self.decision_function(descriptions), self.ovr)
+
+
+def build_scorer(pipeline) -> LinearScorer | PipelineScorer | None:
+    scorer = LinearScorer.from_pipeline(pipeline)
+    if scorer is not None:
+        return scorer
+    if hasattr(pipeline, "predict_proba") and hasattr(pipeline, "classes_"):
+        return PipelineScorer(pipeline)
+    return None
@@ -1,16 +1,37 @@
 import os
+import time
 from dataclasses import dataclass
 
-import numpy as np
-import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
-from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
-from sklearn.model_selection import train_test_split
-from sklearn.pipeline import Pipeline
-
+from app.core.config import settings
 from app.ml.model_store import save_artifacts
 
+# Tuning grid: word and char n-gram vectorizers crossed with LR regularization and
+# class weighting. Kept small enough that grid search on a few thousand rows
+# finishes in seconds on a laptop; the halving strategy bounds it on large datasets.
+PARAM_GRID = [
+    {
+        "tfidf__analyzer": ["word"],
+        "tfidf__ngram_range": [(1, 1), (1, 2)],
+        "clf__C": [0.5, 1.0, 4.0],
+        "clf__class_weight": [None, "balanced"],
+    },
+    {
+        "tfidf__analyzer": ["char_wb"],
+        "tfidf__ngram_range": [(2, 4), (3, 5)],
+        "clf__C": [0.5, 1.0, 4.0],
+        "clf__class_weight": [None, "balanced"],
+    },
+]
+SEARCH_STRATEGIES = ("grid", "halving")
+
+
+def param_grid() -> list[dict]:
+    # The compact format (app/ml/compact.py) only reproduces word analyzers; searching
+    # char n-grams there could pick a model that every worker has to load from joblib
+    if settings.MODEL_FORMAT == "compact":
+        return [grid for grid in PARAM_GRID if grid["tfidf__analyzer"] == ["word"]]
+    return PARAM_GRID
+
 
 @dataclass
 class TrainResult:
@@ -19,11 +40,100 @@ class TrainResult:
     labels: list[str]
 
 
+def _cv_splitter(y, folds: int):
+    from sklearn.model_selection import KFold, StratifiedKFold
+
+    counts = {}
+    for label in y:
+        counts[label] = counts.get(label, 0) + 1
+    smallest = min(counts.values())
+    if smallest >= 2:
+        return StratifiedKFold(n_splits=min(folds, smallest), shuffle=True, random_state=42)
+    return KFold(n_splits=min(folds, len(y)), shuffle=True, random_state=42)
+
+
+def _tune(pipeline, X, y, search: str, folds: int):
+    # Returns the refit best pipeline and a JSON-able report of the search and of a
+    # per-fold cross-validation of the winner.
+    from sklearn.model_selection import GridSearchCV, cross_validate
+
+    if search not in SEARCH_STRATEGIES:
+        raise ValueError(f"Unknown search strategy: {search}")
+    cv = _cv_splitter(y, folds)
+    scoring = settings.TRAIN_SEARCH_SCORING
+    grid = param_grid()
+    kwargs = dict(cv=cv, scoring=scoring, n_jobs=settings.TRAIN_SEARCH_JOBS, refit=True, error_score=float("nan"))
+    if search == "halving":
+        from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+        from sklearn.model_selection import HalvingGridSearchCV
+
+        # Successive halving: every candidate starts on a small sample and only the best
+        # third move on to three times as many rows
+        searcher = HalvingGridSearchCV(pipeline, grid, factor=3, random_state=42, **kwargs)
+    else:
+        searcher = GridSearchCV(pipeline, grid, **kwargs)
+
+    started = time.perf_counter()
+    searcher.fit(X, y)
+    search_seconds = time.perf_counter() - started
+
+    results = searcher.cv_results_
+    ranked = sorted(range(len(results["params"])), key=lambda i: results["rank_test_score"][i])
+    top = [
+        {
+            "params": results["params"][i],
+            "mean_score": float(results["mean_test_score"][i]),
+            "std_score": float(results["std_test_score"][i]),
+            "mean_fit_seconds": float(results["mean_fit_time"][i]),
+            **({"n_resources": int(results["n_resources"][i])} if "n_resources" in results else {}),
+        }
+        for i in ranked[:5]
+    ]
+
+    best = searcher.best_estimator_
+    scores = cross_validate(
+        best, X, y, cv=cv, scoring=["accuracy", "f1_macro"], n_jobs=settings.TRAIN_SEARCH_JOBS, error_score=float("nan")
+    )
+    fold_report = [
+        {
+            "fold": i,
+            "fit_seconds": float(scores["fit_time"][i]),
+            "score_seconds": float(scores["score_time"][i]),
+            "accuracy": float(scores["test_accuracy"][i]),
+            "f1_macro": float(scores["test_f1_macro"][i]),
+        }
+        for i in range(len(scores["fit_time"]))
+    ]
+    report = {
+        "strategy": search,
+        "scoring": scoring,
+        "folds": cv.get_n_splits(),
+        "evaluations": len(results["params"]),
+        "search_seconds": search_seconds,
+        "best_params": searcher.best_params_,
+        "best_score": float(searcher.best_score_),
+        "top": top,
+        "cv": fold_report,
+    }
+    return best, report
+
+
 def train_from_csv(
     dataset_path: str,
     text_column: str,
     label_column: str,
+    tune: bool = False,
+    search: str = "grid",
+    cv_folds: int = 5,
 ) -> TrainResult:
+    # pandas/sklearn are only needed in the training worker; keep them out of API startup
+    import pandas as pd
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
+    from sklearn.model_selection import train_test_split
+    from sklearn.pipeline import Pipeline
+
     if not os.path.exists(dataset_path):
         raise FileNotFoundError(dataset_path)
 
@@ -48,7 +158,11 @@ def train_from_csv(
         ]
     )
 
-    pipeline.fit(X_train, y_train)
+    search_report = None
+    if tune:
+        pipeline, search_report = _tune(pipeline, X_train, y_train, search, cv_folds)
+    else:
+        pipeline.fit(X_train, y_train)
 
     y_pred = pipeline.predict(X_test)
 
@@ -60,7 +174,10 @@ def train_from_csv(
         "accuracy": float(accuracy_score(y_test, y_pred)),
         "report": report,
     }
+    if search_report is not None:
+        metrics["search"] = search_report
 
-    save_artifacts(pipeline=pipeline, labels=labels)
+    # "joblib" when MODEL_FORMAT=compact but the model could not be exported compactly
+    metrics["model_format"] = save_artifacts(pipeline=pipeline, labels=labels)
 
     return TrainResult(metrics=metrics, confusion_matrix=cm.tolist(), labels=labels)
@@ -1 +1 @@
-from . import auth, transactions, model, analytics, insights, export
+from . import auth, transactions, model, analytics, insights, export, rules
@@ -1,49 +1,36 @@
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query
 
-from fastapi import APIRouter, Depends, HTTPException
-
-from app.core.deps import get_current_user
+from app.core.deps import get_token_user
+from app.core.months import add_months, month_range
 from app.db.mongo import get_db
 from app.schemas.analytics import AnomalyPoint, DashboardSummary, TrendPoint
+from app.services.rollups import month_rollups
 
 router = APIRouter()
 
+ANOMALY_MIN_SAMPLES = 5
 
-@router.get("/dashboard", response_model=DashboardSummary)
-async def dashboard(month: str, user=Depends(get_current_user), db=Depends(get_db)):
-    if len(month) != 7 or month[4] != "-":
-        raise HTTPException(status_code=400, detail="Month must be YYYY-MM")
-
-    start = datetime.fromisoformat(month + "-01")
-    if month[5:7] == "12":
-        end = datetime.fromisoformat(str(int(month[:4]) + 1) + "-01-01")
-    else:
-        end = datetime.fromisoformat(month[:5] + f"{int(month[5:7]) + 1:02d}" + "-01")
 
-    pipeline = [
-        {"$match": {"user_id": user["_id"], "date": {"$gte": start, "$lt": end}}},
-        {
-            "$group": {
-                "_id": "$category",
-                "total": {"$sum": "$amount"},
-                "avg_conf": {"$avg": "$confidence"},
-            }
-        },
-    ]
+@router.get("/dashboard", response_model=DashboardSummary)
+async def dashboard(month: str, user=Depends(get_token_user), db=Depends(get_db)):
+    try:
+        month_range(month)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
 
     total_spend = 0.0
     top_category = None
     top_spend = 0.0
     avg_conf_vals = []
 
-    async for row in db.transactions.aggregate(pipeline):
+    for row in await month_rollups(db, user["_id"], month):
         tot = float(row.get("total") or 0.0)
         total_spend += tot
         if tot > top_spend:
             top_spend = tot
-            top_category = row.get("_id") or "Other"
-        if row.get("avg_conf") is not None:
-            avg_conf_vals.append(float(row["avg_conf"]))
+            top_category = row.get("category") or "Other"
+        if row.get("conf_count"):
+            avg_conf_vals.append(float(row["conf_sum"]) / row["conf_count"])
 
     avg_confidence = sum(avg_conf_vals) / len(avg_conf_vals) if avg_conf_vals else None
 
@@ -57,61 +44,80 @@ async def dashboard(month: str, user=Depends(get_current_user), db=Depends(get_d
 
 
 @router.get("/trend", response_model=list[TrendPoint])
-async def trend(user=Depends(get_current_user), db=Depends(get_db)):
+async def trend(user=Depends(get_token_user), db=Depends(get_db)):
     pipeline = [
         {"$match": {"user_id": user["_id"]}},
-        {
-            "$group": {
-                "_id": {"$dateToString": {"format": "%Y-%m", "date": "$date"}},
-                "total": {"$sum": "$amount"},
-            }
-        },
+        {"$group": {"_id": "$month", "total": {"$sum": "$total"}}},
         {"$sort": {"_id": 1}},
     ]
 
     out = []
-    async for row in db.transactions.aggregate(pipeline):
+    async for row in db.monthly_rollups.aggregate(pipeline):
         out.append(TrendPoint(month=row["_id"], total_spend=float(row.get("total") or 0.0)))
     return out
 
 
 @router.get("/anomalies", response_model=list[AnomalyPoint])
-async def anomalies(month: str, user=Depends(get_current_user), db=Depends(get_db)):
-    if len(month) != 7 or month[4] != "-":
-        raise HTTPException(status_code=400, detail="Month must be YYYY-MM")
-
-    start = datetime.fromisoformat(month + "-01")
-    if month[5:7] == "12":
-        end = datetime.fromisoformat(str(int(month[:4]) + 1) + "-01-01")
-    else:
-        end = datetime.fromisoformat(month[:5] + f"{int(month[5:7]) + 1:02d}" + "-01")
-
-    cursor = db.transactions.find({"user_id": user["_id"], "date": {"$gte": start, "$lt": end}})
-    items = []
-    async for doc in cursor:
-        items.append(doc)
-
-    if len(items) < 5:
+async def anomalies(
+    month: str,
+    window_months: int = Query(default=3, ge=1, le=24),
+    z: float = Query(default=2.5, gt=0),
+    user=Depends(get_token_user),
+    db=Depends(get_db),
+):
+    try:
+        start, end = month_range(month)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+    # Per-category baselines over the trailing window (including this month), computed server-side
+    window_start = add_months(start, 1 - window_months)
+    stats_pipeline = [
+        {"$match": {"user_id": user["_id"], "date": {"$gte": window_start, "$lt": end}}},
+        {
+            "$group": {
+                "_id": "$category",
+                "mean": {"$avg": "$amount"},
+                "std": {"$stdDevPop": "$amount"},
+                "count": {"$sum": 1},
+            }
+        },
+        {"$match": {"count": {"$gte": ANOMALY_MIN_SAMPLES}, "std": {"$gt": 0}}},
+    ]
+    baselines = {}
+    async for row in db.transactions.aggregate(stats_pipeline):
+        baselines[row["_id"]] = (float(row["mean"]), float(row["std"]))
+
+    if not baselines:
         return []
 
-    amounts = [float(d.get("amount") or 0.0) for d in items]
-    mean = sum(amounts) / len(amounts)
-    var = sum((x - mean) ** 2 for x in amounts) / len(amounts)
-    std = var ** 0.5 if var > 0 else 1.0
+    # Only rows at or above their category's threshold leave the database
+    cursor = db.transactions.find(
+        {
+            "user_id": user["_id"],
+            "date": {"$gte": start, "$lt": end},
+            "$or": [
+                {"category": cat, "amount": {"$gte": mean + z * std}}
+                for cat, (mean, std) in baselines.items()
+            ],
+        },
+        {"date": 1, "amount": 1, "description": 1, "category": 1},
+    )
 
     out = []
-    for d in items:
+    async for d in cursor:
         amt = float(d.get("amount") or 0.0)
-        z = (amt - mean) / std
-        if z >= 2.5:
-            out.append(
-                AnomalyPoint(
-                    date=d.get("date").isoformat(),
-                    amount=amt,
-                    description=d.get("description") or "",
-                    zscore=float(z),
-                )
+        mean, std = baselines[d.get("category")]
+        out.append(
+            AnomalyPoint(
+                date=d.get("date").isoformat(),
+                amount=amt,
+                description=d.get("description") or "",
+                zscore=(amt - mean) / std,
+                category=d.get("category"),
+                baseline_mean=mean,
             )
+        )
 
     out.sort(key=lambda x: x.zscore, reverse=True)
     return out
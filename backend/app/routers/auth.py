@@ -2,8 +2,8 @@ from uuid import uuid4
 
 from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
 
-from app.core.deps import get_current_user
-from app.core.security import create_access_token, hash_password, verify_password
+from app.core.deps import get_current_user, invalidate_user
+from app.core.security import create_access_token, hash_password_async, verify_and_update_async
 from app.db.mongo import get_db
 from app.schemas.auth import LoginRequest, SignupRequest, TokenResponse, UserPublic
 
@@ -17,7 +17,7 @@ async def signup(payload: SignupRequest, db=Depends(get_db)):
         raise HTTPException(status_code=400, detail="Email already registered")
 
     try:
-        password_hash = hash_password(payload.password)
+        password_hash = await hash_password_async(payload.password)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e)) from e
 
@@ -31,17 +31,24 @@ async def signup(payload: SignupRequest, db=Depends(get_db)):
     }
     await db.users.insert_one(user)
 
-    token = create_access_token(subject=user_id)
+    token = create_access_token(subject=user_id, claims={"email": payload.email, "name": payload.name})
     return TokenResponse(access_token=token)
 
 
 @router.post("/login", response_model=TokenResponse)
 async def login(payload: LoginRequest, db=Depends(get_db)):
     user = await db.users.find_one({"email": payload.email})
-    if not user or not verify_password(payload.password, user.get("password_hash") or ""):
+    if not user:
         raise HTTPException(status_code=401, detail="Invalid email or password")
+    valid, new_hash = await verify_and_update_async(payload.password, user.get("password_hash") or "")
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid email or password")
+    if new_hash:
+        # Hash parameters changed since this password was stored
+        await db.users.update_one({"_id": user["_id"]}, {"$set": {"password_hash": new_hash}})
+        invalidate_user(user["_id"])
 
-    token = create_access_token(subject=user["_id"])
+    token = create_access_token(subject=user["_id"], claims={"email": user["email"], "name": user.get("name")})
     return TokenResponse(access_token=token)
 
 
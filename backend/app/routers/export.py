@@ -1,36 +1,52 @@
+import asyncio
 import csv
+import importlib.util
 import io
-from datetime import datetime
+import os
+import zlib
 
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import Response, StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 
-from app.core.deps import get_current_user
+from app.core.config import settings
+from app.core.deps import get_token_user
+from app.core.months import month_range
 from app.db.mongo import get_db
+from app.services.reports import cached_report_path, data_version, open_cached_report, render_report
+from app.services.rollups import get_data_version
 
 router = APIRouter()
 
 
-@router.get("/transactions.csv")
-async def export_transactions_csv(month: str | None = None, user=Depends(get_current_user), db=Depends(get_db)):
-    query: dict = {"user_id": user["_id"]}
+CSV_COLUMNS = ["date", "amount", "description", "category", "confidence", "source", "explanation"]
+
 
+def _export_query(user_id: str, month: str | None) -> dict:
+    query: dict = {"user_id": user_id}
     if month:
-        if len(month) != 7 or month[4] != "-":
-            raise HTTPException(status_code=400, detail="Month must be YYYY-MM")
-        start = datetime.fromisoformat(month + "-01")
-        if month[5:7] == "12":
-            end = datetime.fromisoformat(str(int(month[:4]) + 1) + "-01-01")
-        else:
-            end = datetime.fromisoformat(month[:5] + f"{int(month[5:7]) + 1:02d}" + "-01")
+        try:
+            start, end = month_range(month)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e)) from e
         query["date"] = {"$gte": start, "$lt": end}
+    return query
 
-    cursor = db.transactions.find(query).sort("date", -1)
 
+async def _csv_chunks(cursor, flush_every: int, compress: bool):
+    # Encodes rows into a small reusable buffer and yields it every flush_every rows,
+    # so memory stays flat and the first bytes go out after the first cursor batch.
     buf = io.StringIO()
     writer = csv.writer(buf)
-    writer.writerow(["date", "amount", "description", "category", "confidence", "source", "explanation"])
+    compressor = zlib.compressobj(wbits=31) if compress else None  # wbits=31: gzip container
+
+    def take() -> bytes:
+        data = buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+        return compressor.compress(data) if compressor else data
 
+    writer.writerow(CSV_COLUMNS)
+    rows = 0
     async for doc in cursor:
         writer.writerow(
             [
@@ -43,74 +59,87 @@ async def export_transactions_csv(month: str | None = None, user=Depends(get_cur
                 doc.get("explanation") or "",
             ]
         )
+        rows += 1
+        if rows % flush_every == 0:
+            chunk = take()
+            if chunk:
+                yield chunk
 
-    csv_bytes = buf.getvalue().encode("utf-8")
-    filename = f"transactions{('-' + month) if month else ''}.csv"
+    chunk = take()
+    if chunk:
+        yield chunk
+    if compressor:
+        yield compressor.flush()
 
-    return Response(
-        content=csv_bytes,
-        media_type="text/csv",
+
+@router.get("/transactions.csv")
+async def export_transactions_csv(
+    month: str | None = None,
+    gzip: bool = False,
+    batch_size: int | None = Query(default=None, ge=10, le=10000),
+    user=Depends(get_token_user),
+    db=Depends(get_db),
+):
+    query = _export_query(user["_id"], month)
+    batch_size = batch_size or settings.EXPORT_BATCH_SIZE
+    projection = {"_id": 0, **{col: 1 for col in CSV_COLUMNS}}
+    cursor = db.transactions.find(query, projection).sort("date", -1).batch_size(batch_size)
+
+    filename = f"transactions{('-' + month) if month else ''}.csv{'.gz' if gzip else ''}"
+    return StreamingResponse(
+        _csv_chunks(cursor, flush_every=batch_size, compress=gzip),
+        media_type="application/gzip" if gzip else "text/csv",
         headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
 
 
-@router.get("/transactions.pdf")
-async def export_transactions_pdf(month: str | None = None, user=Depends(get_current_user), db=Depends(get_db)):
+async def _file_chunks(f, chunk_size: int = 64 * 1024):
     try:
-        from reportlab.lib.pagesizes import letter
-        from reportlab.pdfgen import canvas
-    except Exception as e:
-        raise HTTPException(status_code=500, detail="reportlab not installed") from e
-
-    query: dict = {"user_id": user["_id"]}
-
-    if month:
-        if len(month) != 7 or month[4] != "-":
-            raise HTTPException(status_code=400, detail="Month must be YYYY-MM")
-        start = datetime.fromisoformat(month + "-01")
-        if month[5:7] == "12":
-            end = datetime.fromisoformat(str(int(month[:4]) + 1) + "-01-01")
-        else:
-            end = datetime.fromisoformat(month[:5] + f"{int(month[5:7]) + 1:02d}" + "-01")
-        query["date"] = {"$gte": start, "$lt": end}
+        while chunk := await asyncio.to_thread(f.read, chunk_size):
+            yield chunk
+    finally:
+        f.close()
 
-    cursor = db.transactions.find(query).sort("date", -1).limit(200)
 
-    pdf_buf = io.BytesIO()
-    c = canvas.Canvas(pdf_buf, pagesize=letter)
-    width, height = letter
-
-    title = f"Transactions{(' - ' + month) if month else ''}"
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(40, height - 40, title)
-
-    y = height - 70
-    c.setFont("Helvetica", 9)
-
-    header = "DATE | AMOUNT | CATEGORY | DESCRIPTION"
-    c.drawString(40, y, header)
-    y -= 14
-
-    async for doc in cursor:
-        if y < 60:
-            c.showPage()
-            y = height - 50
-            c.setFont("Helvetica", 9)
-
-        date_str = doc.get("date").strftime("%Y-%m-%d") if doc.get("date") else ""
-        amt = float(doc.get("amount") or 0.0)
-        cat = (doc.get("category") or "")[:20]
-        desc = (doc.get("description") or "")[:60]
-        line = f"{date_str} | {amt:.2f} | {cat} | {desc}"
-        c.drawString(40, y, line)
-        y -= 12
-
-    c.save()
-    pdf_buf.seek(0)
+@router.get("/transactions.pdf")
+async def export_transactions_pdf(month: str | None = None, user=Depends(get_token_user), db=Depends(get_db)):
+    if importlib.util.find_spec("reportlab") is None:
+        raise HTTPException(status_code=500, detail="reportlab not installed")
 
+    query = _export_query(user["_id"], month)
     filename = f"transactions{('-' + month) if month else ''}.pdf"
+
+    # Read the version before the rows: a write landing in between bumps it again,
+    # so the file rendered here is never served for newer data
+    path = cached_report_path(user["_id"], month, data_version(await get_data_version(db, user["_id"])))
+    pdf = open_cached_report(path)
+    if pdf is None:
+        projection = {"_id": 0, "date": 1, "amount": 1, "category": 1, "description": 1}
+        cursor = db.transactions.find(query, projection).sort("date", -1).batch_size(settings.EXPORT_BATCH_SIZE)
+        rows = [
+            (
+                doc.get("date").strftime("%Y-%m-%d") if doc.get("date") else "",
+                float(doc.get("amount") or 0.0),
+                doc.get("category") or "",
+                doc.get("description") or "",
+            )
+            async for doc in cursor
+        ]
+        subtotals: dict[str, float] = {}
+        pipeline = [{"$match": query}, {"$group": {"_id": "$category", "total": {"$sum": "$amount"}}}]
+        async for doc in db.transactions.aggregate(pipeline):
+            category = doc["_id"] or "Other"
+            subtotals[category] = subtotals.get(category, 0.0) + float(doc["total"] or 0.0)
+        title = f"Transactions{(' - ' + month) if month else ''}"
+        pdf = await render_report(path, title, rows, sorted(subtotals.items(), key=lambda kv: kv[1], reverse=True))
+
+    # Streamed from the open handle rather than re-opened by path, which a concurrent
+    # render for newer data may already have unlinked
     return StreamingResponse(
-        pdf_buf,
+        _file_chunks(pdf),
         media_type="application/pdf",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "Content-Length": str(os.fstat(pdf.fileno()).st_size),
+        },
     )
@@ -1,49 +1,118 @@
+import asyncio
 import os
+import shutil
+import tempfile
+from typing import Literal
 
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
 
-from app.core.deps import get_current_user
-from app.ml.trainer import train_from_csv
-from app.schemas.model import PredictRequest, PredictResponse, TrainRequest, TrainResponse
-from app.services.categorizer import categorize
+from app.core.deps import get_current_user, get_token_user
+from app.db.mongo import get_db
+from app.schemas.model import (
+    CategoryScore,
+    PredictBatchRequest,
+    PredictBatchResponse,
+    PredictRequest,
+    PredictResponse,
+    TrainJobOut,
+    TrainRequest,
+)
+from app.services.categorizer import CategorizeResult, categorize, categorize_many
+from app.services.jobs import get_job
+from app.services.training import JOB_KIND as TRAIN_JOB_KIND
+from app.services.training import start_training_job
+from app.services.user_rules import get_rule_engine
 
 router = APIRouter()
 
 
-@router.post("/train", response_model=TrainResponse)
-async def train(payload: TrainRequest, user=Depends(get_current_user)):
+def _train_job_out(job: dict) -> TrainJobOut:
+    return TrainJobOut(
+        id=job["_id"],
+        status=job["status"],
+        dataset_path=job.get("dataset_path"),
+        duration_seconds=job.get("duration_seconds"),
+        metrics=job.get("metrics"),
+        model_version=job.get("model_version"),
+        errors=job.get("errors") or [],
+        created_at=job["created_at"],
+        started_at=job.get("started_at"),
+        finished_at=job.get("finished_at"),
+    )
+
+
+@router.post("/train", response_model=TrainJobOut, status_code=202)
+async def train(payload: TrainRequest, user=Depends(get_current_user), db=Depends(get_db)):
     if not os.path.exists(payload.dataset_path):
         raise HTTPException(status_code=400, detail=f"Dataset not found: {payload.dataset_path}")
 
-    result = train_from_csv(
+    job = await start_training_job(
+        db,
+        user["_id"],
         dataset_path=payload.dataset_path,
         text_column=payload.text_column,
         label_column=payload.label_column,
+        tune=payload.tune,
+        search=payload.search,
+        cv_folds=payload.cv_folds,
     )
+    return _train_job_out(job)
 
-    return TrainResponse(trained=True, metrics={"metrics": result.metrics, "confusion_matrix": result.confusion_matrix, "labels": result.labels})
+
+@router.post("/train-upload", response_model=TrainJobOut, status_code=202)
+async def train_upload(
+    file: UploadFile = File(...),
+    tune: bool = False,
+    search: Literal["grid", "halving"] = "grid",
+    cv_folds: int = Query(default=5, ge=2, le=10),
+    user=Depends(get_current_user),
+    db=Depends(get_db),
+):
+    def _spool() -> str:
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".csv", mode="wb") as tmp:
+            shutil.copyfileobj(file.file, tmp, length=1024 * 1024)
+            return tmp.name
+
+    tmp_path = await asyncio.to_thread(_spool)
+    job = await start_training_job(
+        db,
+        user["_id"],
+        dataset_path=tmp_path,
+        text_column="description",
+        label_column="category",
+        cleanup_path=tmp_path,
+        tune=tune,
+        search=search,
+        cv_folds=cv_folds,
+    )
+    return _train_job_out(job)
 
 
-@router.post("/train-upload", response_model=TrainResponse)
-async def train_upload(file: UploadFile = File(...), user=Depends(get_current_user)):
-    import tempfile
-    import os
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".csv", mode="wb") as tmp:
-        content = await file.read()
-        tmp.write(content)
-        tmp_path = tmp.name
-    try:
-        result = train_from_csv(
-            dataset_path=tmp_path,
-            text_column="description",
-            label_column="category",
-        )
-        return TrainResponse(trained=True, metrics={"metrics": result.metrics, "confusion_matrix": result.confusion_matrix, "labels": result.labels})
-    finally:
-        os.unlink(tmp_path)
+@router.get("/train/jobs/{job_id}", response_model=TrainJobOut)
+async def train_job(job_id: str, user=Depends(get_token_user), db=Depends(get_db)):
+    job = await get_job(db, job_id, user["_id"], TRAIN_JOB_KIND)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _train_job_out(job)
+
+
+def _predict_response(res: CategorizeResult) -> PredictResponse:
+    return PredictResponse(
+        category=res.category,
+        confidence=res.confidence,
+        source=res.source,
+        explanation=res.explanation,
+        alternatives=[CategoryScore(category=cat, score=score) for cat, score in res.alternatives],
+    )
 
 
 @router.post("/predict", response_model=PredictResponse)
-async def predict(payload: PredictRequest, user=Depends(get_current_user)):
-    res = await categorize(payload.description)
-    return PredictResponse(category=res.category, confidence=res.confidence, source=res.source, explanation=res.explanation)
+async def predict(payload: PredictRequest, user=Depends(get_token_user), db=Depends(get_db)):
+    res = await categorize(payload.description, rules=await get_rule_engine(db, user["_id"]))
+    return _predict_response(res)
+
+
+@router.post("/predict-batch", response_model=PredictBatchResponse)
+async def predict_batch(payload: PredictBatchRequest, user=Depends(get_token_user), db=Depends(get_db)):
+    results = await categorize_many(payload.descriptions, rules=await get_rule_engine(db, user["_id"]))
+    return PredictBatchResponse(results=[_predict_response(r) for r in results])
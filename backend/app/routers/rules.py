@@ -0,0 +1,60 @@
+from datetime import datetime
+from uuid import uuid4
+
+from fastapi import APIRouter, Depends, HTTPException
+
+from app.core.config import settings
+from app.core.deps import get_current_user, get_token_user
+from app.db.mongo import get_db
+from app.ml.rules import keyword_tokens
+from app.schemas.rules import RuleCreate, RuleOut
+from app.services.user_rules import invalidate_user_rules
+
+router = APIRouter()
+
+
+def _rule_out(doc: dict) -> RuleOut:
+    return RuleOut(
+        id=doc["_id"],
+        keyword=doc["keyword"],
+        category=doc["category"],
+        priority=doc.get("priority", 100),
+        created_at=doc["created_at"],
+    )
+
+
+@router.get("/", response_model=list[RuleOut])
+async def list_rules(user=Depends(get_token_user), db=Depends(get_db)):
+    cursor = db.rules.find({"user_id": user["_id"]}).sort([("priority", 1), ("created_at", 1)])
+    return [_rule_out(doc) async for doc in cursor]
+
+
+@router.post("/", response_model=RuleOut)
+async def create_rule(payload: RuleCreate, user=Depends(get_current_user), db=Depends(get_db)):
+    if not keyword_tokens(payload.keyword):
+        raise HTTPException(status_code=400, detail="Keyword must contain letters or digits")
+
+    count = await db.rules.count_documents({"user_id": user["_id"]})
+    if count >= settings.RULES_MAX_PER_USER:
+        raise HTTPException(status_code=400, detail=f"Rule limit reached ({settings.RULES_MAX_PER_USER})")
+
+    doc = {
+        "_id": str(uuid4()),
+        "user_id": user["_id"],
+        "keyword": payload.keyword.strip(),
+        "category": payload.category.strip(),
+        "priority": payload.priority,
+        "created_at": datetime.utcnow(),
+    }
+    await db.rules.insert_one(doc)
+    invalidate_user_rules(user["_id"])
+    return _rule_out(doc)
+
+
+@router.delete("/{rule_id}")
+async def delete_rule(rule_id: str, user=Depends(get_current_user), db=Depends(get_db)):
+    res = await db.rules.delete_one({"_id": rule_id, "user_id": user["_id"]})
+    if res.deleted_count == 0:
+        raise HTTPException(status_code=404, detail="Rule not found")
+    invalidate_user_rules(user["_id"])
+    return {"deleted": True}
@@ -1,28 +1,37 @@
-import csv
-import io
 from datetime import datetime
 from uuid import uuid4
 
-import pandas as pd
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
 
-from app.core.deps import get_current_user
+from app.core.config import settings
+from app.core.cursors import after_cursor, encode_cursor
+from app.core.deps import get_current_user, get_token_user
+from app.core.months import month_range
 from app.db.mongo import get_db
+from app.schemas.model import CategoryScore
 from app.schemas.transactions import (
     CategorizeResponse,
+    IngestJobOut,
     MonthSummary,
     TransactionCreate,
     TransactionOut,
-    TransactionUploadResponse,
+    TransactionPage,
+    TransactionRecategorize,
 )
 from app.services.categorizer import categorize
+from app.services.corrections import record_correction
+from app.services.ingest import JOB_KIND as INGEST_JOB_KIND
+from app.services.ingest import IngestError, create_ingest_job, ingest_pool
+from app.services.jobs import get_job
+from app.services.rollups import month_rollups, record_deleted, record_inserted, record_recategorized
+from app.services.user_rules import get_rule_engine
 
 router = APIRouter()
 
 
 @router.post("/", response_model=TransactionOut)
 async def create_transaction(payload: TransactionCreate, user=Depends(get_current_user), db=Depends(get_db)):
-    result = await categorize(payload.description)
+    result = await categorize(payload.description, rules=await get_rule_engine(db, user["_id"]))
     tx_id = str(uuid4())
     doc = {
         "_id": tx_id,
@@ -37,6 +46,7 @@ async def create_transaction(payload: TransactionCreate, user=Depends(get_curren
         "created_at": datetime.utcnow(),
     }
     await db.transactions.insert_one(doc)
+    await record_inserted(db, [doc])
     return TransactionOut(
         id=tx_id,
         date=doc["date"],
@@ -49,122 +59,172 @@ async def create_transaction(payload: TransactionCreate, user=Depends(get_curren
     )
 
 
+# Only the fields TransactionOut needs; newest first with _id breaking ties so the
+# order is total and keyset cursors are stable
+_LIST_PROJECTION = {
+    "date": 1, "description": 1, "amount": 1, "category": 1, "confidence": 1, "source": 1, "explanation": 1
+}
+_LIST_SORT = [("date", -1), ("_id", -1)]
+
+
+def _tx_out(doc: dict) -> TransactionOut:
+    return TransactionOut(
+        id=doc["_id"],
+        date=doc["date"],
+        description=doc["description"],
+        amount=doc["amount"],
+        category=doc.get("category"),
+        confidence=doc.get("confidence"),
+        source=doc.get("source"),
+        explanation=doc.get("explanation"),
+    )
+
+
+@router.get("/", response_model=TransactionPage)
+async def list_transactions(
+    cursor: str | None = None,
+    limit: int = Query(settings.TRANSACTIONS_PAGE_SIZE, ge=1, le=settings.TRANSACTIONS_MAX_PAGE_SIZE),
+    month: str | None = None,
+    category: str | None = None,
+    source: str | None = None,
+    user=Depends(get_token_user),
+    db=Depends(get_db),
+):
+    query: dict = {"user_id": user["_id"]}
+    try:
+        if month:
+            start, end = month_range(month)
+            query["date"] = {"$gte": start, "$lt": end}
+        if cursor:
+            query.update(after_cursor(cursor))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    if category:
+        query["category"] = category
+    if source:
+        query["source"] = source
+
+    # One extra row tells whether there is a next page without a count
+    docs = await db.transactions.find(query, _LIST_PROJECTION).sort(_LIST_SORT).limit(limit + 1).to_list(limit + 1)
+    next_cursor = encode_cursor(docs[limit - 1]["date"], docs[limit - 1]["_id"]) if len(docs) > limit else None
+    return TransactionPage(items=[_tx_out(doc) for doc in docs[:limit]], next_cursor=next_cursor)
+
+
 @router.get("/recent", response_model=list[TransactionOut])
-async def recent(limit: int = 20, user=Depends(get_current_user), db=Depends(get_db)):
-    cursor = db.transactions.find({"user_id": user["_id"]}).sort("date", -1).limit(limit)
-    out: list[TransactionOut] = []
-    async for doc in cursor:
-        out.append(
-            TransactionOut(
-                id=doc["_id"],
-                date=doc["date"],
-                description=doc["description"],
-                amount=doc["amount"],
-                category=doc.get("category"),
-                confidence=doc.get("confidence"),
-                source=doc.get("source"),
-                explanation=doc.get("explanation"),
-            )
-        )
-    return out
+async def recent(
+    limit: int = Query(20, ge=1, le=settings.TRANSACTIONS_MAX_PAGE_SIZE),
+    user=Depends(get_token_user),
+    db=Depends(get_db),
+):
+    cursor = db.transactions.find({"user_id": user["_id"]}, _LIST_PROJECTION).sort(_LIST_SORT).limit(limit)
+    return [_tx_out(doc) async for doc in cursor]
 
 
 @router.post("/categorize", response_model=CategorizeResponse)
-async def categorize_only(description: str, user=Depends(get_current_user)):
-    result = await categorize(description)
+async def categorize_only(description: str, user=Depends(get_token_user), db=Depends(get_db)):
+    result = await categorize(description, rules=await get_rule_engine(db, user["_id"]))
     return CategorizeResponse(
         category=result.category,
         confidence=result.confidence,
         source=result.source,
         explanation=result.explanation,
+        alternatives=[CategoryScore(category=cat, score=score) for cat, score in result.alternatives],
+    )
+
+
+def _job_out(job: dict) -> IngestJobOut:
+    return IngestJobOut(
+        id=job["_id"],
+        status=job["status"],
+        filename=job.get("filename"),
+        rows_done=job.get("rows_done", 0),
+        inserted=job.get("inserted", 0),
+        skipped=job.get("skipped", 0),
+        failed=job.get("failed", 0),
+        rows_per_sec=job.get("rows_per_sec"),
+        errors=job.get("errors") or [],
+        created_at=job["created_at"],
+        started_at=job.get("started_at"),
+        finished_at=job.get("finished_at"),
     )
 
 
-@router.post("/upload", response_model=TransactionUploadResponse)
-async def upload_csv(file: UploadFile = File(...), user=Depends(get_current_user), db=Depends(get_db)):
-    data = await file.read()
+@router.post("/upload", response_model=IngestJobOut, status_code=202)
+async def upload_csv(
+    file: UploadFile = File(...),
+    batch_size: int | None = Query(default=None, ge=1, le=10000),
+    user=Depends(get_current_user),
+    db=Depends(get_db),
+):
     try:
-        df = pd.read_csv(io.BytesIO(data))
-    except Exception as e:
-        raise HTTPException(status_code=400, detail="Invalid CSV") from e
-
-    required = {"date", "amount", "description"}
-    if not required.issubset(set(df.columns)):
-        raise HTTPException(status_code=400, detail=f"CSV must contain columns: {sorted(required)}")
-
-    if df["description"].isna().all():
-        raise HTTPException(status_code=400, detail="CSV description column is empty")
-
-    inserted = 0
-    for _, row in df.iterrows():
-        try:
-            dt = pd.to_datetime(row["date"], utc=True).to_pydatetime()
-        except Exception:
-            continue
-
-        desc = str(row.get("description") or "").strip()
-        if not desc:
-            continue
-        amt = float(row.get("amount") or 0.0)
-
-        try:
-            result = await categorize(desc)
-        except Exception as e:
-            # Fallback: categorize with default if categorizer fails
-            from app.services.categorizer import CategorizeResult
-            result = CategorizeResult(
-                category="Other",
-                confidence=0.25,
-                source="fallback",
-                explanation=f"Categorization failed: {str(e)[:100]}"
-            )
-
-        tx_id = str(uuid4())
-        doc = {
-            "_id": tx_id,
-            "user_id": user["_id"],
-            "date": dt,
-            "description": desc,
-            "amount": amt,
-            "category": result.category,
-            "confidence": result.confidence,
-            "source": result.source,
-            "explanation": result.explanation,
-            "created_at": datetime.utcnow(),
-        }
-        await db.transactions.insert_one(doc)
-        inserted += 1
-
-    return TransactionUploadResponse(inserted=inserted)
+        job = await create_ingest_job(db, user["_id"], file.file, file.filename, batch_size)
+    except IngestError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+    ingest_pool.submit(job["_id"])
+    return _job_out(job)
+
+
+@router.get("/jobs/{job_id}", response_model=IngestJobOut)
+async def upload_job(job_id: str, user=Depends(get_token_user), db=Depends(get_db)):
+    job = await get_job(db, job_id, user["_id"], INGEST_JOB_KIND)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_out(job)
 
 
 @router.get("/month/{month}", response_model=MonthSummary)
-async def month_summary(month: str, user=Depends(get_current_user), db=Depends(get_db)):
-    if len(month) != 7 or month[4] != "-":
-        raise HTTPException(status_code=400, detail="Month must be YYYY-MM")
-
-    start = datetime.fromisoformat(month + "-01")
-    if month[5:7] == "12":
-        end = datetime.fromisoformat(str(int(month[:4]) + 1) + "-01-01")
-    else:
-        end = datetime.fromisoformat(month[:5] + f"{int(month[5:7]) + 1:02d}" + "-01")
-
-    pipeline = [
-        {
-            "$match": {
-                "user_id": user["_id"],
-                "date": {"$gte": start, "$lt": end},
-            }
-        },
-        {"$group": {"_id": "$category", "total": {"$sum": "$amount"}}},
-    ]
+async def month_summary(month: str, user=Depends(get_token_user), db=Depends(get_db)):
+    try:
+        month_range(month)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
 
     by_category = {}
     total = 0.0
-    async for row in db.transactions.aggregate(pipeline):
-        cat = row.get("_id") or "Other"
+    for row in await month_rollups(db, user["_id"], month):
+        cat = row.get("category") or "Other"
         val = float(row.get("total") or 0.0)
-        by_category[cat] = val
+        by_category[cat] = by_category.get(cat, 0.0) + val
         total += val
 
     return MonthSummary(month=month, total_spend=total, by_category=by_category)
+
+
+@router.patch("/{tx_id}", response_model=TransactionOut)
+async def recategorize_transaction(
+    tx_id: str, payload: TransactionRecategorize, user=Depends(get_current_user), db=Depends(get_db)
+):
+    category = payload.category.strip()
+    update = {
+        "category": category,
+        "confidence": 1.0,
+        "source": "user",
+        "explanation": "Set by you",
+        "updated_at": datetime.utcnow(),
+    }
+    old = await db.transactions.find_one_and_update({"_id": tx_id, "user_id": user["_id"]}, {"$set": update})
+    if not old:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    doc = {**old, **update}
+    await record_recategorized(db, old, doc)
+    await record_correction(db, user["_id"], old, category)
+    return TransactionOut(
+        id=doc["_id"],
+        date=doc["date"],
+        description=doc["description"],
+        amount=doc["amount"],
+        category=doc["category"],
+        confidence=doc["confidence"],
+        source=doc["source"],
+        explanation=doc["explanation"],
+    )
+
+
+@router.delete("/{tx_id}")
+async def delete_transaction(tx_id: str, user=Depends(get_current_user), db=Depends(get_db)):
+    doc = await db.transactions.find_one_and_delete({"_id": tx_id, "user_id": user["_id"]})
+    if not doc:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    await record_deleted(db, [doc])
+    return {"deleted": True}
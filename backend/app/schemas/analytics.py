@@ -19,3 +19,5 @@ class AnomalyPoint(BaseModel):
     amount: float
     description: str
     zscore: float
+    category: str | None = None
+    baseline_mean: float | None = None
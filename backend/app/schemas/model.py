@@ -1,23 +1,52 @@
-from pydantic import BaseModel
+from datetime import datetime
+from typing import Literal
+
+from pydantic import BaseModel, Field
 
 
 class TrainRequest(BaseModel):
     dataset_path: str = "../archive (2)/budget_data.csv"
     text_column: str = "description"
     label_column: str = "category"
+    # Cross-validated search over vectorizer/classifier settings instead of the fixed configuration
+    tune: bool = False
+    search: Literal["grid", "halving"] = "grid"
+    cv_folds: int = Field(default=5, ge=2, le=10)
 
 
-class TrainResponse(BaseModel):
-    trained: bool
-    metrics: dict
+class TrainJobOut(BaseModel):
+    id: str
+    status: str
+    dataset_path: str | None = None
+    duration_seconds: float | None = None
+    metrics: dict | None = None
+    model_version: str | None = None
+    errors: list[str] = []
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
 
 
 class PredictRequest(BaseModel):
     description: str
 
 
+class CategoryScore(BaseModel):
+    category: str
+    score: float
+
+
 class PredictResponse(BaseModel):
     category: str
     confidence: float
     source: str
     explanation: str
+    alternatives: list[CategoryScore] = []
+
+
+class PredictBatchRequest(BaseModel):
+    descriptions: list[str] = Field(max_length=10000)
+
+
+class PredictBatchResponse(BaseModel):
+    results: list[PredictResponse]
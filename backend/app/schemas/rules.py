@@ -0,0 +1,17 @@
+from datetime import datetime
+
+from pydantic import BaseModel, Field
+
+
+class RuleCreate(BaseModel):
+    keyword: str = Field(min_length=1, max_length=100)
+    category: str = Field(min_length=1, max_length=50)
+    priority: int = 100
+
+
+class RuleOut(BaseModel):
+    id: str
+    keyword: str
+    category: str
+    priority: int
+    created_at: datetime
@@ -2,6 +2,8 @@ from datetime import datetime
 
 from pydantic import BaseModel, Field
 
+from app.schemas.model import CategoryScore
+
 
 class TransactionCreate(BaseModel):
     date: datetime
@@ -20,8 +22,29 @@ class TransactionOut(BaseModel):
     explanation: str | None = None
 
 
-class TransactionUploadResponse(BaseModel):
-    inserted: int
+class TransactionPage(BaseModel):
+    items: list[TransactionOut]
+    # Pass back as ?cursor= for the next page; null on the last page
+    next_cursor: str | None = None
+
+
+class TransactionRecategorize(BaseModel):
+    category: str = Field(min_length=1, max_length=50)
+
+
+class IngestJobOut(BaseModel):
+    id: str
+    status: str
+    filename: str | None = None
+    rows_done: int = 0
+    inserted: int = 0
+    skipped: int = 0
+    failed: int = 0
+    rows_per_sec: float | None = None
+    errors: list[str] = []
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
 
 
 class CategorizeResponse(BaseModel):
@@ -29,6 +52,7 @@ class CategorizeResponse(BaseModel):
     confidence: float
     source: str
     explanation: str
+    alternatives: list[CategoryScore] = []
 
 
 class MonthSummary(BaseModel):
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Generic, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class BatchScheduler(Generic[T, R]):
+    # Coalesces concurrent submit() calls into batches: a batch is dispatched when
+    # max_batch items are waiting or window seconds after the first one arrived.
+    # At most max_concurrency batches run at once, each bounded by timeout; when a
+    # batch fails or times out every item in it resolves to fallback(item).
+    def __init__(
+        self,
+        handler: Callable[[list[T]], Awaitable[list[R]]],
+        max_batch: int,
+        window: float,
+        max_concurrency: int,
+        timeout: float | None = None,
+        fallback: Callable[[T], R] | None = None,
+    ):
+        self.handler = handler
+        self.max_batch = max_batch
+        self.window = window
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.fallback = fallback
+        self._pending: list[tuple[T, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self.batches = 0
+        self.items = 0
+        self.failures = 0
+        self.in_flight = 0
+        # Items submitted and not yet answered, whether pending, queued or running
+        self.outstanding = 0
+        # Dispatched batch sizes, bucketed by the next power of two
+        self.size_histogram: dict[int, int] = {}
+
+    def _enqueue(self, item: T) -> asyncio.Future:
+        fut = asyncio.get_running_loop().create_future()
+        self._pending.append((item, fut))
+        self.outstanding += 1
+        fut.add_done_callback(self._answered)
+        if len(self._pending) >= self.max_batch:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._dispatch)
+        return fut
+
+    def _answered(self, fut: asyncio.Future) -> None:
+        self.outstanding -= 1
+
+    async def submit(self, item: T) -> R:
+        return await self._enqueue(item)
+
+    async def submit_many(self, items: list[T]) -> list[R]:
+        # Enqueue synchronously so outstanding reflects these items before the first await
+        return list(await asyncio.gather(*[self._enqueue(item) for item in items]))
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch, self._pending = self._pending[: self.max_batch], self._pending[self.max_batch :]
+            task = asyncio.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list[tuple[T, asyncio.Future]]) -> None:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        items = [item for item, _ in batch]
+        bucket = 1 << (len(items) - 1).bit_length()
+        self.size_histogram[bucket] = self.size_histogram.get(bucket, 0) + 1
+        async with self._semaphore:
+            self.in_flight += 1
+            try:
+                results = await asyncio.wait_for(self.handler(items), self.timeout)
+                if len(results) != len(items):
+                    raise ValueError(f"Batch handler returned {len(results)} results for {len(items)} items")
+            except Exception as e:
+                self.failures += 1
+                logger.warning("Batch of %d failed: %s", len(items), e)
+                for item, fut in batch:
+                    if fut.done():
+                        continue
+                    if self.fallback is not None:
+                        fut.set_result(self.fallback(item))
+                    else:
+                        fut.set_exception(e)
+                return
+            finally:
+                self.in_flight -= 1
+                self.batches += 1
+                self.items += len(items)
+
+        for (_, fut), result in zip(batch, results):
+            if not fut.done():
+                fut.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": self.items / self.batches if self.batches else None,
+            "failures": self.failures,
+            "in_flight": self.in_flight,
+            "pending": len(self._pending),
+            "outstanding": self.outstanding,
+            "batch_sizes": {f"<={size}": n for size, n in sorted(self.size_histogram.items())},
+        }
@@ -1,13 +1,22 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-
-import numpy as np
+import asyncio
+import logging
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
 
 from app.core.config import settings
-from app.ml.model_store import load_artifacts
-from app.ml.rules import apply_rules
-from app.services.gemini import gemini_classify
+from app.core.metrics import categorize_results, categorize_stage_seconds
+from app.db.mongo import get_db
+from app.ml.model_store import registry
+from app.ml.rules import RuleEngine, apply_rules
+from app.services.batching import BatchScheduler
+from app.services.cache import TTLCache
+from app.services.gemini import gemini_classify_many, llm_enabled
+from app.services.inference import InferenceBusy, inference
+
+logger = logging.getLogger(__name__)
 
 
 @dataclass
@@ -16,51 +25,268 @@ class CategorizeResult:
     confidence: float
     source: str
     explanation: str
+    alternatives: list[tuple[str, float]] = field(default_factory=list)
+
+
+# (model version, normalized description) -> CategorizeResult for everything past the
+# rules stage. Rules are cheap and per-user, so they always run before the cache.
+result_cache = TTLCache(maxsize=settings.CATEGORIZE_CACHE_SIZE, ttl=settings.CATEGORIZE_CACHE_TTL_SECONDS)
+shared_cache_hits = 0
+
+
+def normalize_description(description: str) -> str:
+    # Only folds case and whitespace: rules and the TF-IDF tokenizer ignore both, so
+    # every description with the same normal form gets the same result.
+    return " ".join((description or "").split()).casefold()
 
 
-def _ml_predict(description: str) -> tuple[str, float, str] | None:
-    artifacts = load_artifacts()
+MLPrediction = tuple[str, float, list[tuple[str, float]]]
+# (version of the model that scored it, prediction); the version comes from the process
+# that ran the model, which can lag behind this one's registry right after a retrain
+MLScored = tuple[str | None, MLPrediction | None]
+
+
+def _ml_predict_many(descriptions: list[str]) -> tuple[str | None, list[MLPrediction] | None]:
+    artifacts = registry.get()
     if artifacts is None:
-        return None
+        return None, None
+    if not descriptions:
+        return artifacts.version, []
 
-    proba = None
-    if hasattr(artifacts.pipeline, "predict_proba"):
-        proba = artifacts.pipeline.predict_proba([description])
+    scorer = artifacts.scorer
+    if scorer is None:
+        return artifacts.version, [(str(pred), 0.5, []) for pred in artifacts.pipeline.predict(descriptions)]
 
-    pred = artifacts.pipeline.predict([description])[0]
+    import numpy as np  # already loaded with the model
 
-    if proba is None:
-        return (str(pred), 0.5, "ml")
+    # One probability matrix gives the label (argmax), its confidence and the runners-up
+    proba = scorer.predict_proba(descriptions)
+    classes = scorer.classes
+    k = min(settings.MODEL_TOP_K, proba.shape[1])
+    top = np.argsort(-proba, axis=1)[:, :k]
+    out = []
+    for row, idx in enumerate(top):
+        alternatives = [(str(classes[i]), float(proba[row, i])) for i in idx]
+        out.append((alternatives[0][0], alternatives[0][1], alternatives))
+    return artifacts.version, out
 
-    proba = np.asarray(proba)[0]
-    idx = int(np.argmax(proba))
-    confidence = float(proba[idx])
-    return (str(pred), confidence, "ml")
 
+async def _ml_batch(descriptions: list[str], wait: bool = False) -> list[MLScored]:
+    version, preds = await inference.run(_ml_predict_many, descriptions, wait=wait)
+    return [(version, preds[i] if preds is not None else None) for i in range(len(descriptions))]
+
+
+# No fallback, so an error reaches every request in the batch. The scheduler never runs
+# more batches than the executor has slots, so backpressure is applied in _ml_predict.
+ml_scheduler: BatchScheduler[str, MLScored] = BatchScheduler(
+    _ml_batch,
+    max_batch=settings.ML_BATCH_SIZE,
+    window=settings.ML_BATCH_WINDOW_MS / 1000,
+    max_concurrency=inference.capacity,
+)
 
-async def categorize(description: str) -> CategorizeResult:
-    rule = apply_rules(description)
-    if rule is not None:
-        cat, conf, source, expl = rule
-        return CategorizeResult(category=cat, confidence=conf, source=source, explanation=expl)
-
-    ml = _ml_predict(description)
-    if ml is not None:
-        cat, conf, source = ml
-        return CategorizeResult(
-            category=cat,
-            confidence=conf,
-            source=source,
-            explanation=f"ML prediction with confidence {conf:.2f}",
-        )
 
-    gem = await gemini_classify(description)
-    if gem is not None:
-        return gem
+async def _ml_predict(descriptions: list[str], wait: bool) -> list[MLScored]:
+    # Ingestion chunks are already batches and must not be rejected; small interactive
+    # requests go through the scheduler so concurrent ones share one predict_proba call.
+    if wait or settings.ML_BATCH_WINDOW_MS <= 0 or len(descriptions) >= settings.ML_BATCH_SIZE:
+        return await _ml_batch(descriptions, wait)
+    # The executor holds at most capacity batches of ML_BATCH_SIZE; beyond that many
+    # outstanding items, answer 503 instead of letting the scheduler backlog grow.
+    if ml_scheduler.outstanding + len(descriptions) > inference.capacity * settings.ML_BATCH_SIZE:
+        inference.rejected += 1
+        raise InferenceBusy("Prediction queue is full, retry shortly")
+    return await ml_scheduler.submit_many(descriptions)
 
+
+def _ml_result(ml: MLPrediction) -> CategorizeResult:
+    cat, conf, alternatives = ml
+    explanation = f"ML prediction with confidence {conf:.2f}"
+    if conf < settings.CONFIDENCE_THRESHOLD:
+        explanation += f" (below threshold {settings.CONFIDENCE_THRESHOLD:.2f})"
+    return CategorizeResult(
+        category=cat,
+        confidence=conf,
+        source="ml",
+        explanation=explanation,
+        alternatives=alternatives,
+    )
+
+
+def _default_result() -> CategorizeResult:
     return CategorizeResult(
         category="Other",
         confidence=0.25,
         source="default",
         explanation="No rule match; ML unavailable/low confidence; Gemini unavailable",
     )
+
+
+def _cacheable(result: CategorizeResult) -> bool:
+    # A weak ML answer or the default is what we fall back to when escalation failed or
+    # timed out; keep them out of the cache so a later request can still escalate.
+    # The ingest "fallback" (categorizer error) is never cached either.
+    if result.source == "fallback":
+        return False
+    if not llm_enabled():
+        return True
+    if result.source == "default":
+        return False
+    return result.source != "ml" or result.confidence >= settings.CONFIDENCE_THRESHOLD
+
+
+async def _cascade(descriptions: list[str], wait: bool) -> tuple[list[CategorizeResult], list[str | None]]:
+    # ML first (on the inference executor); anything it is not confident about is
+    # escalated to the LLM stage in batches. A low-confidence ML guess still beats the
+    # default when the LLM has no answer. Also returns the model version behind each result.
+    results: list[CategorizeResult | None] = [None] * len(descriptions)
+    started = time.perf_counter()
+    scored = await _ml_predict(descriptions, wait)
+    versions = [version for version, _ in scored]
+    preds = [pred for _, pred in scored]
+    categorize_stage_seconds.observe(time.perf_counter() - started, "ml")
+    low: list[int] = []
+    for i in range(len(descriptions)):
+        if preds[i] is not None and preds[i][1] >= settings.CONFIDENCE_THRESHOLD:
+            results[i] = _ml_result(preds[i])
+        else:
+            low.append(i)
+
+    if low:
+        started = time.perf_counter()
+        gems = await gemini_classify_many([descriptions[i] for i in low])
+        if llm_enabled():
+            categorize_stage_seconds.observe(time.perf_counter() - started, "gemini")
+        for i, gem in zip(low, gems):
+            if gem is not None:
+                results[i] = CategorizeResult(
+                    **asdict(gem), alternatives=preds[i][2] if preds[i] is not None else []
+                )
+            elif preds[i] is not None:
+                results[i] = _ml_result(preds[i])
+            else:
+                results[i] = _default_result()
+    return results, versions
+
+
+def _cache_id(version: str | None, norm: str) -> str:
+    return f"{version or 'none'}:{norm}"
+
+
+async def _shared_get(keys: list[str]) -> dict[str, CategorizeResult]:
+    global shared_cache_hits
+    if not settings.CATEGORIZE_CACHE_SHARED or not keys:
+        return {}
+    try:
+        cursor = get_db().categorize_cache.find(
+            {"_id": {"$in": keys}, "expires_at": {"$gt": datetime.utcnow()}},
+            {"category": 1, "confidence": 1, "source": 1, "explanation": 1, "alternatives": 1},
+        )
+        found = {
+            doc["_id"]: CategorizeResult(
+                category=doc["category"],
+                confidence=doc["confidence"],
+                source=doc["source"],
+                explanation=doc["explanation"],
+                alternatives=[(cat, score) for cat, score in doc.get("alternatives") or []],
+            )
+            async for doc in cursor
+        }
+    except Exception:
+        logger.exception("Shared categorize cache lookup failed")
+        return {}
+    shared_cache_hits += len(found)
+    return found
+
+
+async def _shared_put(entries: dict[str, CategorizeResult]) -> None:
+    if not settings.CATEGORIZE_CACHE_SHARED or not entries:
+        return
+    expires_at = datetime.utcnow() + timedelta(seconds=settings.CATEGORIZE_CACHE_TTL_SECONDS)
+    docs = [{"_id": key, **asdict(result), "expires_at": expires_at} for key, result in entries.items()]
+    try:
+        await get_db().categorize_cache.insert_many(docs, ordered=False)
+    except Exception:
+        # Duplicate keys just mean another worker cached the same description first
+        pass
+
+
+async def categorize(description: str, rules: RuleEngine | None = None) -> CategorizeResult:
+    return (await categorize_many([description], rules))[0]
+
+
+async def categorize_many(
+    descriptions: list[str], rules: RuleEngine | None = None, wait: bool = False
+) -> list[CategorizeResult]:
+    # Rules run per row; whatever falls through is deduplicated by normalized
+    # description, served from the result cache where possible, and the rest is
+    # scored with a single predict_proba call over the whole batch. With wait=False
+    # a full inference queue raises InferenceBusy instead of queueing.
+    results: list[CategorizeResult | None] = [None] * len(descriptions)
+    pending: dict[str, list[int]] = {}
+    started = time.perf_counter()
+    for i, description in enumerate(descriptions):
+        rule = apply_rules(description, rules)
+        if rule is None:
+            pending.setdefault(normalize_description(description), []).append(i)
+            continue
+        cat, conf, source, expl = rule
+        results[i] = CategorizeResult(category=cat, confidence=conf, source=source, explanation=expl)
+    categorize_stage_seconds.observe(time.perf_counter() - started, "rules")
+
+    if not pending:
+        _count_sources(results)
+        return results
+
+    if registry.check_due():
+        # The stat check may hash a new model file; keep that off the event loop
+        await asyncio.to_thread(registry.current_version)
+    version = registry.current_version()
+    started = time.perf_counter()
+    resolved: dict[str, CategorizeResult] = {}
+    for norm in pending:
+        hit = result_cache.get(_cache_id(version, norm))
+        if hit is not None:
+            resolved[norm] = hit
+
+    shared = await _shared_get([_cache_id(version, norm) for norm in pending if norm not in resolved])
+    for key, result in shared.items():
+        norm = key.split(":", 1)[1]
+        resolved[norm] = result
+        result_cache.set(key, result)
+
+    categorize_stage_seconds.observe(time.perf_counter() - started, "cache")
+
+    missing = [norm for norm in pending if norm not in resolved]
+    if missing:
+        computed, versions = await _cascade([descriptions[pending[norm][0]] for norm in missing], wait)
+        fresh = {}
+        for norm, result, scored_by in zip(missing, computed, versions):
+            resolved[norm] = result
+            if not _cacheable(result):
+                continue
+            # Key on the model that actually scored it: an inference worker can still be
+            # on the previous model for up to MODEL_RELOAD_INTERVAL_SECONDS after a retrain
+            key = _cache_id(scored_by, norm)
+            result_cache.set(key, result)
+            fresh[key] = result
+        await _shared_put(fresh)
+
+    for norm, indices in pending.items():
+        for i in indices:
+            results[i] = resolved[norm]
+    _count_sources(results)
+    return results
+
+
+def _count_sources(results: list[CategorizeResult]) -> None:
+    for result in results:
+        categorize_results.inc(result.source)
+
+
+def ml_batch_stats() -> dict:
+    return ml_scheduler.stats()
+
+
+def cache_stats() -> dict:
+    return {**result_cache.stats(), "shared": settings.CATEGORIZE_CACHE_SHARED, "shared_hits": shared_cache_hits}
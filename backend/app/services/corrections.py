@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from pymongo.errors import DuplicateKeyError
+
+from app.core.config import settings
+from app.ml.rules import keyword_tokens
+from app.services.user_rules import invalidate_user_rules
+
+logger = logging.getLogger(__name__)
+
+CLAIM_LEASE_SECONDS = 300
+
+# Recategorizations are appended to `corrections` as they happen. The fold step
+# periodically collapses the unfolded ones into `user_overrides`, one document per
+# (user, description words) holding the latest category; get_rule_engine loads those
+# as exact-match rules in front of the user's keyword rules and the global model.
+# Nothing is refit, so a correction costs one upsert instead of a retrain.
+
+
+def override_key(description: str) -> str:
+    return " ".join(keyword_tokens(description or ""))
+
+
+async def record_correction(db, user_id: str, tx: dict, category: str) -> None:
+    await db.corrections.insert_one(
+        {
+            "_id": str(uuid4()),
+            "user_id": user_id,
+            "transaction_id": tx["_id"],
+            "description": tx.get("description") or "",
+            "previous_category": tx.get("category"),
+            "category": category,
+            "created_at": datetime.utcnow(),
+            "folded_at": None,
+        }
+    )
+
+
+async def _claim(db, limit: int) -> list[dict]:
+    # Every worker runs fold_forever; a lease makes sure each correction is folded by
+    # one of them, and an expired lease (worker died mid-fold) can be taken over.
+    now = datetime.utcnow()
+    unclaimed = {"folded_at": None, "$or": [{"folding_until": None}, {"folding_until": {"$lt": now}}]}
+    cursor = db.corrections.find(unclaimed, {"_id": 1}).sort("created_at", 1).limit(limit)
+    ids = [doc["_id"] async for doc in cursor]
+    if not ids:
+        return []
+    claim = str(uuid4())
+    await db.corrections.update_many(
+        {"_id": {"$in": ids}, **unclaimed},
+        {"$set": {"folding_by": claim, "folding_until": now + timedelta(seconds=CLAIM_LEASE_SECONDS)}},
+    )
+    cursor = db.corrections.find(
+        {"folding_by": claim, "folded_at": None}, {"user_id": 1, "description": 1, "category": 1, "created_at": 1}
+    ).sort("created_at", 1)
+    return [doc async for doc in cursor]
+
+
+async def _upsert_override(db, user_id: str, key: str, doc: dict, now: datetime) -> None:
+    # Only a newer correction may replace an override, whatever order folds finish in.
+    # An existing override with a newer corrected_at fails the filter, and the upsert
+    # then collides on _id.
+    try:
+        await db.user_overrides.update_one(
+            {
+                "_id": f"{user_id}:{key}",
+                "$or": [{"corrected_at": {"$lt": doc["created_at"]}}, {"corrected_at": {"$exists": False}}],
+            },
+            {
+                "$set": {
+                    "user_id": user_id,
+                    "key": key,
+                    "category": doc["category"],
+                    "corrected_at": doc["created_at"],
+                    "updated_at": now,
+                }
+            },
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        pass
+
+
+async def fold_corrections(db, limit: int = 10000) -> int:
+    corrections = await _claim(db, limit)
+    if not corrections:
+        return 0
+
+    # Later corrections of the same description win
+    latest: dict[tuple[str, str], dict] = {}
+    for doc in corrections:
+        key = override_key(doc["description"])
+        if key:
+            latest[(doc["user_id"], key)] = doc
+
+    now = datetime.utcnow()
+    for (user_id, key), doc in latest.items():
+        await _upsert_override(db, user_id, key, doc, now)
+    await db.corrections.update_many(
+        {"_id": {"$in": [doc["_id"] for doc in corrections]}}, {"$set": {"folded_at": now}}
+    )
+    # Clears this worker's cached engines; other workers pick the overrides up when
+    # theirs expire, within RULES_CACHE_TTL_SECONDS
+    for user_id in {user_id for user_id, _ in latest}:
+        invalidate_user_rules(user_id)
+    return len(corrections)
+
+
+async def fold_forever(db) -> None:
+    while True:
+        await asyncio.sleep(settings.CORRECTIONS_FOLD_INTERVAL_SECONDS)
+        try:
+            folded = await fold_corrections(db)
+            if folded:
+                logger.info("Folded %d corrections into user overrides", folded)
+        except Exception:
+            logger.exception("Could not fold corrections")
+
+
+async def _main() -> None:
+    from app.db.indexes import ensure_indexes
+    from app.db.mongo import get_db
+
+    db = get_db()
+    await ensure_indexes(db)
+    total = 0
+    while folded := await fold_corrections(db):
+        total += folded
+    print(f"Folded {total} corrections")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fold pending user corrections into per-user overrides")
+    parser.add_argument("--fold", action="store_true", required=True)
+    parser.parse_args()
+    asyncio.run(_main())
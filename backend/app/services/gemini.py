@@ -1,10 +1,17 @@
 from __future__ import annotations
 
+import asyncio
+import json
+import re
 from dataclasses import dataclass
-
-# Removed langchain import to avoid model initialization errors
+from typing import Protocol
 
 from app.core.config import settings
+from app.ml.model_store import model_labels, registry
+from app.ml.rules import BUILTIN_RULES
+from app.services.batching import BatchScheduler
+from app.services.inference import inference
+from app.services.llm import LLMClient, get_llm_client
 
 
 @dataclass
@@ -15,6 +22,136 @@ class GeminiResult:
     explanation: str
 
 
-async def gemini_classify(description: str) -> GeminiResult | None:
-    # Temporarily disable Gemini due to model availability issues
+class LLMBackend(Protocol):
+    async def classify_batch(self, descriptions: list[str], labels: list[str]) -> list[GeminiResult | None]: ...
+
+
+# (version of the model the labels came from, candidate labels)
+_labels: tuple[str | None, list[str]] | None = None
+
+
+async def _candidate_labels() -> list[str]:
+    # The labels of the model the inference workers score with; this process may never
+    # load it. Fetched again only once the model version on disk changes.
+    global _labels
+    if registry.check_due():
+        await asyncio.to_thread(registry.current_version)
+    if _labels is None or _labels[0] != registry.current_version():
+        version, labels = await inference.run(model_labels, wait=True)
+        if not labels:
+            labels = sorted({rule.label for rule in BUILTIN_RULES})
+        if "Other" not in labels:
+            labels.append("Other")
+        _labels = (version, labels)
+    return _labels[1]
+
+
+def build_prompt(descriptions: list[str], labels: list[str]) -> str:
+    lines = "\n".join(f"{i + 1}. {desc}" for i, desc in enumerate(descriptions))
+    return (
+        "Classify each bank transaction description into exactly one of these categories: "
+        f"{', '.join(labels)}.\n"
+        "Reply with only a JSON array containing one object per description, in the same order, "
+        'like [{"category": "<category>", "confidence": <0..1>}].\n\n'
+        f"{lines}"
+    )
+
+
+def parse_reply(text: str, count: int, labels: list[str]) -> list[GeminiResult | None]:
+    match = re.search(r"\[.*\]", text or "", re.S)
+    if not match:
+        raise ValueError("LLM reply did not contain a JSON array")
+    items = json.loads(match.group(0))
+    if not isinstance(items, list) or len(items) != count:
+        raise ValueError(f"LLM returned {len(items) if isinstance(items, list) else 0} answers for {count} descriptions")
+
+    allowed = {label.lower(): label for label in labels}
+    out: list[GeminiResult | None] = []
+    for item in items:
+        category = allowed.get(str((item or {}).get("category", "")).strip().lower())
+        if category is None:
+            out.append(None)
+            continue
+        try:
+            confidence = min(max(float(item.get("confidence", 0.7)), 0.0), 1.0)
+        except (TypeError, ValueError):
+            confidence = 0.7
+        out.append(
+            GeminiResult(
+                category=category,
+                confidence=confidence,
+                source="gemini",
+                explanation=f"Gemini classification with confidence {confidence:.2f}",
+            )
+        )
+    return out
+
+
+class GeminiBackend:
+    def __init__(self, client: LLMClient):
+        self.client = client
+
+    async def classify_batch(self, descriptions: list[str], labels: list[str]) -> list[GeminiResult | None]:
+        reply = await self.client.generate(build_prompt(descriptions, labels))
+        return parse_reply(reply, len(descriptions), labels)
+
+
+class FakeLLMBackend:
+    # Local stand-in for tests and development: picks a label whose name appears in
+    # the description, and nothing otherwise.
+    def __init__(self):
+        self.calls = 0
+
+    async def classify_batch(self, descriptions: list[str], labels: list[str]) -> list[GeminiResult | None]:
+        self.calls += 1
+        out: list[GeminiResult | None] = []
+        for desc in descriptions:
+            text = desc.lower()
+            label = next((label for label in labels if label.lower() in text), None)
+            out.append(
+                GeminiResult(category=label, confidence=0.7, source="gemini", explanation="Fake LLM classification")
+                if label
+                else None
+            )
+        return out
+
+
+def _make_backend() -> LLMBackend | None:
+    if settings.LLM_BACKEND == "fake":
+        return FakeLLMBackend()
+    if settings.LLM_BACKEND == "gemini" and settings.GEMINI_API_KEY:
+        return GeminiBackend(get_llm_client())
     return None
+
+
+backend: LLMBackend | None = _make_backend()
+
+
+async def _classify_batch(descriptions: list[str]) -> list[GeminiResult | None]:
+    return await backend.classify_batch(descriptions, await _candidate_labels())
+
+
+scheduler: BatchScheduler[str, GeminiResult | None] = BatchScheduler(
+    _classify_batch,
+    max_batch=settings.LLM_BATCH_SIZE,
+    window=settings.LLM_BATCH_WINDOW_MS / 1000,
+    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+    timeout=settings.LLM_TIMEOUT_SECONDS,
+    fallback=lambda _: None,
+)
+
+
+def llm_enabled() -> bool:
+    return backend is not None
+
+
+async def gemini_classify(description: str) -> GeminiResult | None:
+    if backend is None:
+        return None
+    return await scheduler.submit(description)
+
+
+async def gemini_classify_many(descriptions: list[str]) -> list[GeminiResult | None]:
+    if backend is None:
+        return [None] * len(descriptions)
+    return await scheduler.submit_many(descriptions)
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable
+
+from app.core.config import settings
+
+
+class InferenceBusy(Exception):
+    pass
+
+
+def _timed(fn: Callable, args: tuple, submitted: float) -> tuple[float, Any]:
+    # Runs in the worker; perf_counter is system-wide on Linux so the wait can be measured across processes
+    waited = time.perf_counter() - submitted
+    return waited, fn(*args)
+
+
+class InferenceExecutor:
+    # CPU-bound model work runs here instead of on the event loop. At most `workers`
+    # calls run at once and at most `queue_size` more wait for a worker; beyond that,
+    # run() raises InferenceBusy (the API answers 503) unless the caller asked to wait,
+    # which background work such as CSV ingestion does.
+    def __init__(self, kind: str, workers: int, queue_size: int):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown inference executor: {kind}")
+        self.kind = kind
+        self.workers = workers
+        self.capacity = workers + queue_size
+        self._executor: Executor | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self.submitted = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self._waits: deque[float] = deque(maxlen=1000)
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                # Each process loads its own model; use MODEL_FORMAT=compact so they share it via mmap
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+        return self._executor
+
+    async def run(self, fn: Callable, *args, wait: bool = False) -> Any:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.capacity)
+        if self._slots.locked() and not wait:
+            self.rejected += 1
+            raise InferenceBusy("Prediction queue is full, retry shortly")
+
+        async with self._slots:
+            self.submitted += 1
+            self.running += 1
+            try:
+                loop = asyncio.get_running_loop()
+                waited, result = await loop.run_in_executor(
+                    self._get_executor(), _timed, fn, args, time.perf_counter()
+                )
+            finally:
+                self.running -= 1
+            self.completed += 1
+            self._waits.append(waited)
+            return result
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        waits = sorted(self._waits)
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "capacity": self.capacity,
+            "in_flight": self.running,
+            "queue_depth": max(self.running - self.workers, 0),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "wait_ms_avg": sum(waits) / len(waits) * 1000 if waits else None,
+            "wait_ms_p99": waits[min(len(waits) - 1, int(len(waits) * 0.99))] * 1000 if waits else None,
+        }
+
+
+inference = InferenceExecutor(
+    settings.INFERENCE_EXECUTOR, workers=settings.INFERENCE_WORKERS, queue_size=settings.INFERENCE_QUEUE_SIZE
+)
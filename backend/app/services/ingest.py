@@ -0,0 +1,368 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import shutil
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import TYPE_CHECKING, Awaitable, BinaryIO, Callable
+from uuid import uuid4
+
+from pymongo.errors import BulkWriteError
+
+from app.core.config import settings
+from app.core.metrics import ingest_rows, ingest_rows_per_second
+from app.services import jobs
+from app.services.categorizer import CategorizeResult, categorize_many
+from app.services.rollups import rebuild_rollups, record_inserted
+from app.services.user_rules import get_rule_engine
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_COLUMNS = {"date", "amount", "description"}
+JOB_KIND = "ingest"
+DUPLICATE_KEY = 11000
+
+
+class IngestError(ValueError):
+    pass
+
+
+@dataclass
+class IngestStats:
+    rows_done: int = 0
+    inserted: int = 0
+    skipped: int = 0
+    failed: int = 0
+    has_descriptions: bool = False
+
+
+def _open_reader(fileobj: BinaryIO | str, chunk_size: int):
+    import pandas as pd
+
+    try:
+        return pd.read_csv(fileobj, chunksize=chunk_size)
+    except Exception as e:
+        raise IngestError("Invalid CSV") from e
+
+
+def _next_chunk(reader) -> pd.DataFrame | None:
+    try:
+        return next(reader)
+    except StopIteration:
+        return None
+    except Exception as e:
+        raise IngestError("Invalid CSV") from e
+
+
+def check_csv_header(path: str) -> None:
+    import pandas as pd
+
+    try:
+        columns = set(pd.read_csv(path, nrows=0).columns)
+    except Exception as e:
+        raise IngestError("Invalid CSV") from e
+    if not REQUIRED_COLUMNS.issubset(columns):
+        raise IngestError(f"CSV must contain columns: {sorted(REQUIRED_COLUMNS)}")
+
+
+def _prepare_chunk(df: pd.DataFrame) -> tuple[list[tuple[int, datetime, str, float]], int]:
+    import pandas as pd
+
+    dates = pd.to_datetime(df["date"], utc=True, errors="coerce", format="mixed")
+    descs = df["description"].fillna("").astype(str).str.strip()
+    amounts = pd.to_numeric(df["amount"], errors="coerce").fillna(0.0)
+    valid = (dates.notna() & (descs != "")).to_numpy()
+
+    rows = [
+        (pos, dt.to_pydatetime(), desc, float(amt))
+        for pos, dt, desc, amt in zip(valid.nonzero()[0], dates[valid], descs[valid], amounts[valid])
+    ]
+    return rows, len(df) - len(rows)
+
+
+async def _categorize_rows(db, user_id: str, descriptions: list[str]) -> list[CategorizeResult]:
+    try:
+        # Background work: wait for an inference slot rather than being rejected
+        return await categorize_many(descriptions, rules=await get_rule_engine(db, user_id), wait=True)
+    except Exception as e:
+        # Fallback: categorize with default if categorizer fails
+        fallback = CategorizeResult(
+            category="Other",
+            confidence=0.25,
+            source="fallback",
+            explanation=f"Categorization failed: {str(e)[:100]}",
+        )
+        return [fallback] * len(descriptions)
+
+
+async def _flush(db, docs: list[dict], stats: IngestStats) -> list[str]:
+    if not docs:
+        return []
+    try:
+        res = await db.transactions.insert_many(docs, ordered=False)
+        stats.inserted += len(res.inserted_ids)
+        await record_inserted(db, docs)
+        return []
+    except BulkWriteError as e:
+        stats.inserted += e.details.get("nInserted", 0)
+        errors = []
+        rejected = set()
+        for err in e.details.get("writeErrors", []):
+            rejected.add(err.get("index"))
+            # Ids are derived from the job id and record number, so a duplicate is a row this
+            # job inserted in an earlier attempt whose progress was never saved
+            if err.get("code") == DUPLICATE_KEY:
+                stats.inserted += 1
+            else:
+                stats.failed += 1
+                errors.append(f"row {err.get('index')}: {err.get('errmsg', '')[:200]}")
+        await record_inserted(db, [doc for i, doc in enumerate(docs) if i not in rejected])
+        return errors
+
+
+async def ingest_chunk(
+    df: pd.DataFrame,
+    user_id: str,
+    db,
+    stats: IngestStats,
+    id_prefix: str | None = None,
+) -> list[str]:
+    if not REQUIRED_COLUMNS.issubset(set(df.columns)):
+        raise IngestError(f"CSV must contain columns: {sorted(REQUIRED_COLUMNS)}")
+    if df["description"].notna().any():
+        stats.has_descriptions = True
+
+    first_row = stats.rows_done
+    stats.rows_done += len(df)
+    rows, skipped = _prepare_chunk(df)
+    stats.skipped += skipped
+    if not rows:
+        return []
+
+    results = await _categorize_rows(db, user_id, [desc for _, _, desc, _ in rows])
+    now = datetime.utcnow()
+    docs = [
+        {
+            "_id": f"{id_prefix}:{first_row + pos}" if id_prefix else str(uuid4()),
+            "user_id": user_id,
+            "date": dt,
+            "description": desc,
+            "amount": amt,
+            "category": result.category,
+            "confidence": result.confidence,
+            "source": result.source,
+            "explanation": result.explanation,
+            "created_at": now,
+        }
+        for (pos, dt, desc, amt), result in zip(rows, results)
+    ]
+    return await _flush(db, docs, stats)
+
+
+async def ingest_csv(
+    fileobj: BinaryIO | str,
+    user_id: str,
+    db,
+    batch_size: int | None = None,
+    stats: IngestStats | None = None,
+    id_prefix: str | None = None,
+    on_chunk: Callable[[IngestStats, list[str]], Awaitable[None]] | None = None,
+) -> IngestStats:
+    # Parses the upload chunk by chunk (off the event loop) so memory stays bounded by
+    # batch_size rows, and writes each chunk with a single unordered insert_many.
+    # Passing stats from an earlier run resumes after stats.rows_done rows.
+    batch_size = batch_size or settings.INGEST_BATCH_SIZE
+    stats = stats or IngestStats()
+    reader = await asyncio.to_thread(_open_reader, fileobj, batch_size)
+    # rows_done counts CSV records, and a quoted field may span several lines. pandas
+    # documents skiprows as line numbers, so drop already ingested records from the
+    # parsed chunks instead
+    skip = stats.rows_done
+    try:
+        while True:
+            chunk = await asyncio.to_thread(_next_chunk, reader)
+            if chunk is None:
+                break
+            if skip:
+                if len(chunk) <= skip:
+                    skip -= len(chunk)
+                    continue
+                chunk, skip = chunk.iloc[skip:], 0
+            errors = await ingest_chunk(chunk, user_id, db, stats, id_prefix=id_prefix)
+            if on_chunk is not None:
+                await on_chunk(stats, errors)
+    finally:
+        reader.close()
+
+    if not stats.has_descriptions and stats.inserted == 0:
+        raise IngestError("CSV description column is empty")
+    return stats
+
+
+def job_upload_path(job_id: str) -> str:
+    return os.path.join(settings.INGEST_DIR, f"{job_id}.csv")
+
+
+async def create_ingest_job(db, user_id: str, fileobj: BinaryIO, filename: str | None, batch_size: int | None) -> dict:
+    job_id = str(uuid4())
+    path = job_upload_path(job_id)
+
+    def _spool():
+        os.makedirs(settings.INGEST_DIR, exist_ok=True)
+        with open(path, "wb") as out:
+            shutil.copyfileobj(fileobj, out, length=1024 * 1024)
+        check_csv_header(path)
+
+    try:
+        await asyncio.to_thread(_spool)
+    except Exception:
+        if os.path.exists(path):
+            os.unlink(path)
+        raise
+
+    return await jobs.create_job(
+        db,
+        JOB_KIND,
+        user_id,
+        _id=job_id,
+        path=path,
+        filename=filename,
+        batch_size=batch_size or settings.INGEST_BATCH_SIZE,
+        rows_done=0,
+        inserted=0,
+        skipped=0,
+        failed=0,
+        rows_per_sec=None,
+    )
+
+
+async def run_ingest_job(db, job_id: str) -> None:
+    job = await jobs.claim_job(db, job_id, settings.INGEST_JOB_STALE_SECONDS)
+    if job is None:
+        return  # finished, or another worker holds it
+
+    stats = IngestStats(
+        rows_done=job.get("rows_done", 0),
+        inserted=job.get("inserted", 0),
+        skipped=job.get("skipped", 0),
+        failed=job.get("failed", 0),
+        has_descriptions=job.get("rows_done", 0) > 0,
+    )
+    started = time.monotonic()
+    resumed_from = stats.rows_done
+
+    def _progress() -> dict:
+        elapsed = time.monotonic() - started
+        rate = (stats.rows_done - resumed_from) / elapsed if elapsed > 0 else None
+        return {
+            "rows_done": stats.rows_done,
+            "inserted": stats.inserted,
+            "skipped": stats.skipped,
+            "failed": stats.failed,
+            "rows_per_sec": rate,
+        }
+
+    counted = stats.rows_done
+
+    async def _on_chunk(stats: IngestStats, errors: list[str]) -> None:
+        nonlocal counted
+        progress = _progress()
+        ingest_rows.inc(amount=stats.rows_done - counted)
+        counted = stats.rows_done
+        if progress["rows_per_sec"] is not None:
+            ingest_rows_per_second.set(value=progress["rows_per_sec"])
+        await jobs.update_job(db, job_id, errors=errors, **progress)
+
+    heartbeat = asyncio.create_task(jobs.keep_alive(db, job_id, settings.INGEST_JOB_STALE_SECONDS / 3))
+    try:
+        await ingest_csv(
+            job["path"],
+            job["user_id"],
+            db,
+            batch_size=job.get("batch_size"),
+            stats=stats,
+            id_prefix=job_id,
+            on_chunk=_on_chunk,
+        )
+    except Exception as e:
+        logger.exception("Ingest job %s failed", job_id)
+        await jobs.finish_job(db, job_id, jobs.STATUS_FAILED, errors=[str(e)[:200]], **_progress())
+    else:
+        await jobs.finish_job(db, job_id, jobs.STATUS_DONE, **_progress())
+    finally:
+        heartbeat.cancel()
+
+    if job.get("attempts", 1) > 1:
+        # A crash between insert_many and record_inserted leaves rows whose rollup delta
+        # was never applied, and on resume they are duplicates that are not re-recorded;
+        # recompute the user's rollups from their transactions instead.
+        try:
+            await rebuild_rollups(db, job["user_id"])
+        except Exception:
+            logger.exception("Could not rebuild rollups after resuming ingest job %s", job_id)
+
+    try:
+        os.unlink(job["path"])
+    except FileNotFoundError:
+        pass
+
+
+class IngestWorkerPool:
+    # A fixed number of worker tasks drain an in-process queue of job ids. Jobs
+    # themselves are persisted, so the queue is rebuilt from Mongo at startup and
+    # periodically re-scanned for jobs abandoned by crashed workers.
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._queue: asyncio.Queue[str] = asyncio.Queue()
+        self._pending: set[str] = set()
+        self._tasks: list[asyncio.Task] = []
+        self._db = None
+
+    async def start(self, db) -> None:
+        self._db = db
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._rescan()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, job_id: str) -> None:
+        if job_id in self._pending:
+            return
+        self._pending.add(job_id)
+        self._queue.put_nowait(job_id)
+
+    def stats(self) -> dict:
+        return {"workers": self.workers, "queued": self._queue.qsize()}
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await run_ingest_job(self._db, job_id)
+            except Exception:
+                logger.exception("Ingest worker crashed on job %s", job_id)
+            finally:
+                self._pending.discard(job_id)
+                self._queue.task_done()
+
+    async def _rescan(self) -> None:
+        while True:
+            try:
+                for job_id in await jobs.resumable_job_ids(self._db, JOB_KIND, settings.INGEST_JOB_STALE_SECONDS):
+                    self.submit(job_id)
+            except Exception:
+                logger.exception("Could not scan for resumable ingest jobs")
+            await asyncio.sleep(settings.INGEST_JOB_STALE_SECONDS)
+
+
+ingest_pool = IngestWorkerPool(workers=settings.INGEST_WORKERS)
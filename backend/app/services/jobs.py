@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+# Jobs live in one collection, distinguished by "kind". A worker claims a job by
+# flipping it to "running" and keeps its heartbeat fresh while it makes progress;
+# "running" jobs whose heartbeat went stale belong to a dead process and may be
+# claimed again.
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+MAX_JOB_ERRORS = 20
+
+
+async def create_job(db, kind: str, user_id: str, **fields) -> dict:
+    now = datetime.utcnow()
+    job = {
+        "_id": str(uuid4()),
+        "kind": kind,
+        "user_id": user_id,
+        "status": STATUS_QUEUED,
+        "errors": [],
+        "created_at": now,
+        "started_at": None,
+        "finished_at": None,
+        "heartbeat_at": None,
+        **fields,
+    }
+    await db.jobs.insert_one(job)
+    return job
+
+
+async def get_job(db, job_id: str, user_id: str, kind: str) -> dict | None:
+    return await db.jobs.find_one({"_id": job_id, "user_id": user_id, "kind": kind})
+
+
+async def claim_job(db, job_id: str, stale_after: float | None = None) -> dict | None:
+    now = datetime.utcnow()
+    claimable: list[dict] = [{"status": STATUS_QUEUED}]
+    if stale_after is not None:
+        claimable.append({"status": STATUS_RUNNING, "heartbeat_at": {"$lt": now - timedelta(seconds=stale_after)}})
+    return await db.jobs.find_one_and_update(
+        {"_id": job_id, "$or": claimable},
+        {"$set": {"status": STATUS_RUNNING, "started_at": now, "heartbeat_at": now}, "$inc": {"attempts": 1}},
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def update_job(db, job_id: str, errors: list[str] | None = None, **fields) -> None:
+    update: dict = {"$set": {**fields, "heartbeat_at": datetime.utcnow()}}
+    if errors:
+        update["$push"] = {"errors": {"$each": errors, "$slice": -MAX_JOB_ERRORS}}
+    await db.jobs.update_one({"_id": job_id}, update)
+
+
+async def keep_alive(db, job_id: str, interval: float) -> None:
+    # Run as a side task while a job works, so a single long step (a large chunk, a
+    # training run) does not leave the heartbeat stale and let another worker claim it
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await db.jobs.update_one(
+                {"_id": job_id, "status": STATUS_RUNNING}, {"$set": {"heartbeat_at": datetime.utcnow()}}
+            )
+        except Exception:
+            logger.exception("Could not refresh heartbeat of job %s", job_id)
+
+
+async def finish_job(db, job_id: str, status: str, errors: list[str] | None = None, **fields) -> None:
+    await update_job(db, job_id, errors=errors, status=status, finished_at=datetime.utcnow(), **fields)
+
+
+async def fail_stale_jobs(db, kind: str, stale_after: float, error: str) -> int:
+    # For kinds that cannot resume: jobs whose worker died are marked failed instead of
+    # staying "running" forever
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=stale_after)
+    res = await db.jobs.update_many(
+        {
+            "kind": kind,
+            "$or": [
+                {"status": STATUS_QUEUED, "created_at": {"$lt": stale}},
+                {"status": STATUS_RUNNING, "heartbeat_at": {"$lt": stale}},
+            ],
+        },
+        {"$set": {"status": STATUS_FAILED, "finished_at": now}, "$push": {"errors": error}},
+    )
+    return res.modified_count
+
+
+async def resumable_job_ids(db, kind: str, stale_after: float) -> list[str]:
+    stale = datetime.utcnow() - timedelta(seconds=stale_after)
+    cursor = db.jobs.find(
+        {
+            "kind": kind,
+            "$or": [
+                {"status": STATUS_QUEUED},
+                {"status": STATUS_RUNNING, "heartbeat_at": {"$lt": stale}},
+            ],
+        },
+        {"_id": 1},
+    ).sort("created_at", 1)
+    return [doc["_id"] async for doc in cursor]
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import asyncio
+
+from app.core.config import settings
+
+
+class LLMTimeout(Exception):
+    pass
+
+
+class LLMClient:
+    # One chat model per process. It is built on first use inside the event loop so
+    # langchain also creates its async client; its channel (or HTTP session for the
+    # rest transport) is then reused by every call. Calls are capped at
+    # max_concurrency in flight and each one is bounded by timeout.
+    def __init__(self, api_key: str, model: str, max_concurrency: int, timeout: float):
+        self.api_key = api_key
+        self.model = model
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._llm = None
+        self.calls = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.in_flight = 0
+
+    def _client(self):
+        if self._llm is None:
+            from langchain_google_genai import ChatGoogleGenerativeAI
+
+            kwargs = {}
+            if settings.GEMINI_API_ENDPOINT:
+                kwargs["client_options"] = {"api_endpoint": settings.GEMINI_API_ENDPOINT}
+            if settings.GEMINI_TRANSPORT:
+                kwargs["transport"] = settings.GEMINI_TRANSPORT
+            self._llm = ChatGoogleGenerativeAI(
+                model=self.model,
+                google_api_key=self.api_key,
+                timeout=self.timeout,
+                max_retries=settings.LLM_MAX_RETRIES,
+                **kwargs,
+            )
+            if settings.GEMINI_TRANSPORT == "rest":
+                # The async gapic client only speaks grpc_asyncio; without it langchain
+                # runs the (pooled) sync REST session in a thread instead.
+                self._llm.async_client = None
+        return self._llm
+
+    async def generate(self, prompt: str) -> str:
+        async with self._semaphore:
+            self.calls += 1
+            self.in_flight += 1
+            try:
+                resp = await asyncio.wait_for(self._client().ainvoke(prompt), self.timeout)
+            except asyncio.TimeoutError as e:
+                self.timeouts += 1
+                raise LLMTimeout(f"LLM call exceeded {self.timeout:.0f}s") from e
+            except Exception:
+                self.failures += 1
+                raise
+            finally:
+                self.in_flight -= 1
+        return (resp.content or "").strip()
+
+    def stats(self) -> dict:
+        return {
+            "model": self.model,
+            "calls": self.calls,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "in_flight": self.in_flight,
+        }
+
+
+_client: LLMClient | None = None
+
+
+def get_llm_client() -> LLMClient | None:
+    global _client
+    if _client is None and settings.GEMINI_API_KEY:
+        _client = LLMClient(
+            settings.GEMINI_API_KEY,
+            settings.GEMINI_MODEL,
+            max_concurrency=settings.LLM_MAX_CONCURRENCY,
+            timeout=settings.LLM_TIMEOUT_SECONDS,
+        )
+    return _client
+
+
+def llm_client_stats() -> dict | None:
+    return _client.stats() if _client is not None else None
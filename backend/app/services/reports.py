@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import asyncio
+import glob
+import multiprocessing
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from app.core.config import settings
+
+# Bump when the PDF layout changes so cached reports are re-rendered
+LAYOUT_VERSION = "2"
+
+_executor: ProcessPoolExecutor | None = None
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.REPORT_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def data_version(write_version: int) -> str:
+    # write_version is the user's data_versions counter (app/services/rollups.py), bumped
+    # by every insert, delete and recategorization, so any change to their data misses.
+    return f"{LAYOUT_VERSION}.{write_version}"
+
+
+def cached_report_path(user_id: str, month: str | None, version: str) -> str:
+    return os.path.join(settings.REPORT_CACHE_DIR, user_id, f"{month or 'all'}-{version}.pdf")
+
+
+def _version_key(path: str) -> tuple[int, ...] | None:
+    # "<scope>-<layout>.<write_version>.pdf" -> (layout, write_version)
+    try:
+        return tuple(int(part) for part in os.path.basename(path)[:-4].rsplit("-", 1)[1].split("."))
+    except (IndexError, ValueError):
+        return None
+
+
+def _drop_stale(path: str) -> None:
+    # Only versions older than the one just rendered: a concurrent request for newer
+    # data may have rendered its file already. Requests serving an older file hold it
+    # open, so unlinking it does not cut their download short.
+    directory, name = os.path.split(path)
+    scope = name.rsplit("-", 1)[0]
+    current = _version_key(path)
+    for old in glob.glob(os.path.join(directory, f"{scope}-*.pdf")):
+        key = _version_key(old)
+        # Unparsable names come from the older content-hash naming
+        if old != path and (key is None or key < current):
+            try:
+                os.unlink(old)
+            except FileNotFoundError:
+                pass
+
+
+def open_cached_report(path: str):
+    # The open handle keeps serving the file even if a newer render unlinks it
+    try:
+        return open(path, "rb")
+    except FileNotFoundError:
+        return None
+
+
+def render_transactions_pdf(path: str, title: str, rows: list[tuple], subtotals: list[tuple[str, float]]) -> None:
+    # Runs in a worker process and writes a temporary file that render_report publishes.
+    # rows are (date, amount, category, description) tuples.
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    width, height = letter
+    margin = 40
+    line_height = 12
+    cols = {"date": margin, "amount": margin + 130, "category": margin + 145, "description": margin + 255}
+
+    c = canvas.Canvas(path, pagesize=letter)
+    page = 0
+
+    def new_page(heading: str) -> float:
+        nonlocal page
+        if page:
+            c.showPage()
+        page += 1
+        c.setFont("Helvetica-Bold", 14)
+        c.drawString(margin, height - 40, title)
+        c.setFont("Helvetica", 8)
+        c.drawRightString(width - margin, height - 40, f"Page {page}")
+        c.setFont("Helvetica-Bold", 9)
+        c.drawString(margin, height - 62, heading)
+        return height - 78
+
+    def table_header(y: float) -> float:
+        c.setFont("Helvetica-Bold", 9)
+        c.drawString(cols["date"], y, "DATE")
+        c.drawRightString(cols["amount"], y, "AMOUNT")
+        c.drawString(cols["category"], y, "CATEGORY")
+        c.drawString(cols["description"], y, "DESCRIPTION")
+        c.setFont("Helvetica", 9)
+        return y - line_height - 2
+
+    y = table_header(new_page(f"{len(rows)} transactions"))
+    for date_str, amount, category, description in rows:
+        if y < margin + line_height:
+            y = table_header(new_page("Transactions (continued)"))
+        c.drawString(cols["date"], y, date_str)
+        c.drawRightString(cols["amount"], y, f"{amount:,.2f}")
+        c.drawString(cols["category"], y, category[:20])
+        c.drawString(cols["description"], y, description[:60])
+        y -= line_height
+
+    y -= line_height
+    if y < margin + line_height * (len(subtotals) + 3):
+        y = new_page("Category subtotals")
+    else:
+        c.setFont("Helvetica-Bold", 9)
+        c.drawString(margin, y, "Category subtotals")
+        y -= line_height + 2
+
+    c.setFont("Helvetica", 9)
+    for category, total in subtotals:
+        if y < margin + line_height:
+            y = new_page("Category subtotals (continued)")
+            c.setFont("Helvetica", 9)
+        c.drawString(cols["date"], y, category[:40])
+        c.drawRightString(cols["amount"] + 100, y, f"{total:,.2f}")
+        y -= line_height
+
+    c.setFont("Helvetica-Bold", 9)
+    c.drawString(cols["date"], y, "Total")
+    c.drawRightString(cols["amount"] + 100, y, f"{sum(t for _, t in subtotals):,.2f}")
+
+    c.save()
+
+
+async def render_report(path: str, title: str, rows: list[tuple], subtotals: list[tuple[str, float]]):
+    # Returns the rendered report opened for reading. It is opened before being moved
+    # into place, so no concurrent _drop_stale can remove it before it is served.
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(get_executor(), render_transactions_pdf, tmp_path, title, rows, subtotals)
+        pdf = open(tmp_path, "rb")
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    _drop_stale(path)
+    return pdf
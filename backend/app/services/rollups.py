@@ -0,0 +1,160 @@
+import argparse
+import asyncio
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+# monthly_rollups holds one document per (user_id, month, category) with the running
+# total, row count and confidence sum/count of that user's transactions. Every write
+# path that inserts, deletes or recategorizes transactions applies the matching delta,
+# so the dashboard, trend and month summary read O(categories) documents. The
+# --rebuild command recomputes everything from transactions for backfills or drift.
+#
+# The same write paths bump the user's counter in data_versions, which keys caches of
+# anything rendered from that user's transactions (PDF reports).
+
+
+def month_key(dt: datetime) -> str:
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc)
+    return dt.strftime("%Y-%m")
+
+
+def _delta_ops(docs: list[dict], sign: int) -> list[UpdateOne]:
+    deltas: dict[tuple, list[float]] = defaultdict(lambda: [0.0, 0, 0.0, 0])
+    for doc in docs:
+        key = (doc["user_id"], month_key(doc["date"]), doc.get("category"))
+        delta = deltas[key]
+        delta[0] += sign * float(doc.get("amount") or 0.0)
+        delta[1] += sign
+        if doc.get("confidence") is not None:
+            delta[2] += sign * float(doc["confidence"])
+            delta[3] += sign
+    return [
+        UpdateOne(
+            {"user_id": user_id, "month": month, "category": category},
+            {"$inc": {"total": total, "count": count, "conf_sum": conf_sum, "conf_count": conf_count}},
+            upsert=True,
+        )
+        for (user_id, month, category), (total, count, conf_sum, conf_count) in deltas.items()
+    ]
+
+
+async def _apply(db, ops: list[UpdateOne]) -> None:
+    if ops:
+        await db.monthly_rollups.bulk_write(ops, ordered=False)
+
+
+async def bump_data_version(db, user_ids) -> None:
+    for user_id in set(user_ids):
+        await db.data_versions.update_one({"_id": user_id}, {"$inc": {"version": 1}}, upsert=True)
+
+
+async def get_data_version(db, user_id: str) -> int:
+    doc = await db.data_versions.find_one({"_id": user_id})
+    return int(doc["version"]) if doc else 0
+
+
+async def record_inserted(db, docs: list[dict]) -> None:
+    await _apply(db, _delta_ops(docs, +1))
+    await bump_data_version(db, (d["user_id"] for d in docs))
+
+
+async def record_deleted(db, docs: list[dict]) -> None:
+    await _apply(db, _delta_ops(docs, -1))
+    await bump_data_version(db, (d["user_id"] for d in docs))
+    # Drop rollups that no longer cover any transaction
+    await db.monthly_rollups.delete_many({"user_id": {"$in": list({d["user_id"] for d in docs})}, "count": {"$lte": 0}})
+
+
+async def record_recategorized(db, old_doc: dict, new_doc: dict) -> None:
+    await _apply(db, _delta_ops([old_doc], -1) + _delta_ops([new_doc], +1))
+    await bump_data_version(db, [old_doc["user_id"]])
+    await db.monthly_rollups.delete_many({"user_id": old_doc["user_id"], "count": {"$lte": 0}})
+
+
+async def month_rollups(db, user_id: str, month: str) -> list[dict]:
+    cursor = db.monthly_rollups.find(
+        {"user_id": user_id, "month": month},
+        {"_id": 0, "category": 1, "total": 1, "count": 1, "conf_sum": 1, "conf_count": 1},
+    )
+    return [row async for row in cursor]
+
+
+async def rebuild_rollups(db, user_id: str | None = None) -> int:
+    match = {"user_id": user_id} if user_id else {}
+    await db.monthly_rollups.delete_many(match)
+    pipeline = [
+        {"$match": match},
+        {
+            "$group": {
+                "_id": {
+                    "user_id": "$user_id",
+                    "month": {"$dateToString": {"format": "%Y-%m", "date": "$date"}},
+                    "category": "$category",
+                },
+                "total": {"$sum": "$amount"},
+                "count": {"$sum": 1},
+                "conf_sum": {"$sum": "$confidence"},
+                "conf_count": {"$sum": {"$cond": [{"$isNumber": "$confidence"}, 1, 0]}},
+            }
+        },
+        {
+            "$project": {
+                "_id": 0,
+                "user_id": "$_id.user_id",
+                "month": "$_id.month",
+                "category": "$_id.category",
+                "total": 1,
+                "count": 1,
+                "conf_sum": 1,
+                "conf_count": 1,
+            }
+        },
+        {"$merge": {"into": "monthly_rollups", "on": ["user_id", "month", "category"], "whenMatched": "replace"}},
+    ]
+    async for _ in db.transactions.aggregate(pipeline):
+        pass
+    return await db.monthly_rollups.count_documents(match)
+
+
+BACKFILL_MARKER = "monthly_rollups_backfill"
+
+
+async def backfill_rollups(db) -> bool:
+    # Deployments that predate rollups have transactions but no rollups. The first
+    # worker to start inserts the marker and rebuilds everything; the others skip.
+    # A failed rebuild removes the marker so the next start retries.
+    try:
+        await db.migrations.insert_one({"_id": BACKFILL_MARKER, "status": "running", "started_at": datetime.utcnow()})
+    except DuplicateKeyError:
+        return False
+    try:
+        await rebuild_rollups(db)
+    except Exception:
+        await db.migrations.delete_one({"_id": BACKFILL_MARKER})
+        raise
+    await db.migrations.update_one(
+        {"_id": BACKFILL_MARKER}, {"$set": {"status": "done", "finished_at": datetime.utcnow()}}
+    )
+    return True
+
+
+async def _main(user_id: str | None) -> None:
+    from app.db.indexes import ensure_indexes
+    from app.db.mongo import get_db
+
+    db = get_db()
+    await ensure_indexes(db)
+    count = await rebuild_rollups(db, user_id)
+    print(f"Rebuilt {count} monthly rollups{' for ' + user_id if user_id else ''}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild monthly_rollups from transactions")
+    parser.add_argument("--rebuild", action="store_true", required=True)
+    parser.add_argument("--user", help="only rebuild this user id")
+    args = parser.parse_args()
+    asyncio.run(_main(args.user))
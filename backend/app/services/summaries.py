@@ -0,0 +1,37 @@
+import hashlib
+import json
+from datetime import datetime
+
+from app.core.config import settings
+
+# One cached AI summary per (user, month) in the insight_summaries collection. The
+# stored hash covers the model and the category totals the prompt was built from, so
+# the LLM is only called again once that month's spending (or the model) changes.
+
+
+def totals_hash(rows: list[dict]) -> str:
+    key = [settings.GEMINI_MODEL] + [(r["category"], round(r["total"], 2)) for r in rows]
+    return hashlib.sha256(json.dumps(key).encode()).hexdigest()[:16]
+
+
+def _summary_id(user_id: str, month: str) -> str:
+    return f"{user_id}:{month}"
+
+
+async def get_cached_summary(db, user_id: str, month: str, digest: str) -> str | None:
+    doc = await db.insight_summaries.find_one({"_id": _summary_id(user_id, month), "totals_hash": digest})
+    return doc["summary"] if doc else None
+
+
+async def store_summary(db, user_id: str, month: str, digest: str, summary: str) -> None:
+    await db.insight_summaries.replace_one(
+        {"_id": _summary_id(user_id, month)},
+        {
+            "user_id": user_id,
+            "month": month,
+            "totals_hash": digest,
+            "summary": summary,
+            "created_at": datetime.utcnow(),
+        },
+        upsert=True,
+    )
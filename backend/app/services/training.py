@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from app.core.config import settings
+from app.ml.model_store import registry
+from app.ml.trainer import train_from_csv
+from app.services import jobs
+
+logger = logging.getLogger(__name__)
+
+JOB_KIND = "train"
+
+_executor: ProcessPoolExecutor | None = None
+_tasks: set[asyncio.Task] = set()
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn: forking a process that already runs the event loop and Mongo threads is unsafe
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.TRAIN_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _to_builtin(value):
+    # sklearn reports may hold numpy scalars, which BSON cannot encode
+    return json.loads(json.dumps(value, default=lambda o: o.item() if hasattr(o, "item") else str(o)))
+
+
+async def start_training_job(
+    db,
+    user_id: str,
+    dataset_path: str,
+    text_column: str,
+    label_column: str,
+    cleanup_path: str | None = None,
+    tune: bool = False,
+    search: str = "grid",
+    cv_folds: int = 5,
+) -> dict:
+    job = await jobs.create_job(
+        db,
+        JOB_KIND,
+        user_id,
+        dataset_path=dataset_path,
+        text_column=text_column,
+        label_column=label_column,
+        tune=tune,
+        search=search,
+        cv_folds=cv_folds,
+        duration_seconds=None,
+        metrics=None,
+        model_version=None,
+    )
+    task = asyncio.create_task(_run_training_job(db, job["_id"], cleanup_path))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return job
+
+
+async def _run_training_job(db, job_id: str, cleanup_path: str | None) -> None:
+    try:
+        job = await jobs.claim_job(db, job_id)
+        if job is None:
+            return
+
+        started = time.monotonic()
+        loop = asyncio.get_running_loop()
+        heartbeat = asyncio.create_task(jobs.keep_alive(db, job_id, settings.TRAIN_JOB_STALE_SECONDS / 3))
+        try:
+            result = await loop.run_in_executor(
+                get_executor(),
+                train_from_csv,
+                job["dataset_path"],
+                job["text_column"],
+                job["label_column"],
+                job.get("tune", False),
+                job.get("search", "grid"),
+                job.get("cv_folds", 5),
+            )
+        except Exception as e:
+            logger.exception("Training job %s failed", job_id)
+            await jobs.finish_job(
+                db,
+                job_id,
+                jobs.STATUS_FAILED,
+                errors=[f"{type(e).__name__}: {str(e)[:200]}"],
+                duration_seconds=time.monotonic() - started,
+            )
+            return
+        finally:
+            heartbeat.cancel()
+
+        # Make this worker see the new version now (and load it on next use when scoring
+        # in-process); other workers pick it up on their next stat check
+        registry.invalidate()
+        version = await asyncio.to_thread(registry.current_version)
+        await jobs.finish_job(
+            db,
+            job_id,
+            jobs.STATUS_DONE,
+            duration_seconds=time.monotonic() - started,
+            metrics=_to_builtin(
+                {"metrics": result.metrics, "confusion_matrix": result.confusion_matrix, "labels": result.labels}
+            ),
+            model_version=version,
+        )
+    finally:
+        if cleanup_path:
+            try:
+                os.unlink(cleanup_path)
+            except FileNotFoundError:
+                pass
+
+
+async def fail_abandoned_jobs_forever(db) -> None:
+    # Training runs inside the API process that started it and cannot be resumed, so a
+    # job whose process died (its heartbeat went stale) is marked failed
+    while True:
+        try:
+            failed = await jobs.fail_stale_jobs(
+                db, JOB_KIND, settings.TRAIN_JOB_STALE_SECONDS, "Interrupted: the worker running this job stopped"
+            )
+            if failed:
+                logger.warning("Marked %d abandoned training job(s) as failed", failed)
+        except Exception:
+            logger.exception("Could not check for abandoned training jobs")
+        await asyncio.sleep(settings.TRAIN_JOB_STALE_SECONDS)
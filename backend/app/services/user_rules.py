@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from app.core.config import settings
+from app.ml.rules import BUILTIN_RULES, Rule, RuleEngine, default_engine
+from app.services.cache import TTLCache
+
+# user_id -> compiled engine, LRU-bounded. Entries are dropped on every rule change made
+# through this worker; the TTL bounds how long other workers serve stale rules.
+_engines = TTLCache(maxsize=settings.RULES_CACHE_SIZE, ttl=settings.RULES_CACHE_TTL_SECONDS)
+
+
+def invalidate_user_rules(user_id: str) -> None:
+    _engines.pop(user_id)
+
+
+async def get_rule_engine(db, user_id: str) -> RuleEngine:
+    cached = _engines.get(user_id)
+    if cached is not None:
+        return cached
+
+    cursor = db.rules.find({"user_id": user_id}, {"keyword": 1, "category": 1}).sort([("priority", 1), ("created_at", 1)])
+    user_rules = [Rule(label=doc["category"], keyword=doc["keyword"], user=True) async for doc in cursor]
+    # Folded corrections (see app.services.corrections) match whole descriptions only
+    cursor = (
+        db.user_overrides.find({"user_id": user_id}, {"key": 1, "category": 1})
+        .sort("updated_at", -1)
+        .limit(settings.RULES_MAX_PER_USER)
+    )
+    overrides = [Rule(label=doc["category"], keyword=doc["key"], user=True, exact=True) async for doc in cursor]
+    # User rules take precedence over the built-in ones
+    engine = RuleEngine(overrides + user_rules + BUILTIN_RULES) if user_rules or overrides else default_engine
+
+    _engines.set(user_id, engine)
+    return engine
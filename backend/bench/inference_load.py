@@ -0,0 +1,79 @@
+import argparse
+import asyncio
+import time
+
+import httpx
+
+# Event-loop health under prediction load: hammers /api/model/predict-batch with
+# unique descriptions (so the result cache cannot help) while probing /api/health and
+# /api/transactions/recent, and prints probe latency percentiles with and without
+# the load. Run against a live server:
+#
+#   python -m bench.inference_load --base-url http://localhost:8000 --email you@example.com --password ...
+
+
+def _percentiles(samples: list[float]) -> str:
+    if not samples:
+        return "no samples"
+    samples = sorted(samples)
+    p = lambda q: samples[min(len(samples) - 1, int(len(samples) * q))] * 1000  # noqa: E731
+    return f"p50 {p(0.50):7.1f} ms  p99 {p(0.99):7.1f} ms  max {samples[-1] * 1000:7.1f} ms  (n={len(samples)})"
+
+
+async def _probe(client: httpx.AsyncClient, path: str, headers: dict, stop: asyncio.Event, out: list[float]) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get(path, headers=headers)
+        out.append(time.perf_counter() - start)
+        await asyncio.sleep(0.01)
+
+
+async def _hammer(client: httpx.AsyncClient, headers: dict, stop: asyncio.Event, batch: int, counts: dict, worker: int) -> None:
+    n = 0
+    while not stop.is_set():
+        descriptions = [f"bench payment {worker}-{n}-{i} store" for i in range(batch)]
+        n += 1
+        resp = await client.post("/api/model/predict-batch", json={"descriptions": descriptions}, headers=headers)
+        counts[resp.status_code] = counts.get(resp.status_code, 0) + 1
+
+
+async def _phase(client, headers, seconds: float, load: int, batch: int) -> None:
+    stop = asyncio.Event()
+    health: list[float] = []
+    recent: list[float] = []
+    counts: dict[int, int] = {}
+    tasks = [
+        asyncio.create_task(_probe(client, "/api/health", {}, stop, health)),
+        asyncio.create_task(_probe(client, "/api/transactions/recent?limit=20", headers, stop, recent)),
+    ] + [asyncio.create_task(_hammer(client, headers, stop, batch, counts, w)) for w in range(load)]
+    await asyncio.sleep(seconds)
+    stop.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    label = f"{load} predict clients" if load else "idle"
+    print(f"[{label}]")
+    print(f"  /api/health  {_percentiles(health)}")
+    print(f"  /recent      {_percentiles(recent)}")
+    if counts:
+        print(f"  predict-batch responses: {dict(sorted(counts.items()))}")
+
+
+async def main(args) -> None:
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=60) as client:
+        resp = await client.post("/api/auth/login", json={"email": args.email, "password": args.password})
+        resp.raise_for_status()
+        headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+        await _phase(client, headers, args.seconds, 0, args.batch)
+        await _phase(client, headers, args.seconds, args.concurrency, args.batch)
+        stats = (await client.get("/api/stats")).json().get("inference")
+        print(f"inference executor: {stats}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Probe latency while predictions are hammered")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--batch", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,50 @@
+import argparse
+import asyncio
+import time
+
+from app.core.config import settings
+from app.core.security import hash_password, shutdown_hash_executor, verify_and_update_async
+
+# Logins/sec for one worker process: runs password verification the way the login
+# handler does (on the hash pool) while a ticker measures how long the event loop stalls.
+
+
+async def _ticker(stop: asyncio.Event, lags: list[float], interval: float = 0.005) -> None:
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lags.append(loop.time() - start - interval)
+
+
+async def _run(logins: int, concurrency: int) -> None:
+    password = "correct horse battery staple"
+    stored = hash_password(password)
+    sem = asyncio.Semaphore(concurrency)
+
+    async def login() -> None:
+        async with sem:
+            valid, _ = await verify_and_update_async(password, stored)
+            assert valid
+
+    stop, lags = asyncio.Event(), []
+    ticker = asyncio.create_task(_ticker(stop, lags))
+    start = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await ticker
+    shutdown_hash_executor()
+
+    print(f"scheme={settings.PASSWORD_SCHEME} pbkdf2_rounds={settings.PASSWORD_PBKDF2_ROUNDS} workers={settings.PASSWORD_HASH_WORKERS}")
+    print(f"{logins} logins in {elapsed:.2f}s -> {logins / elapsed:.1f} logins/sec")
+    if lags:
+        print(f"event loop lag: max {max(lags) * 1000:.1f} ms, mean {sum(lags) / len(lags) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark password verification throughput")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(_run(args.logins, args.concurrency))
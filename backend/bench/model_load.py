@@ -0,0 +1,101 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+# Load time and per-worker memory of the joblib model vs the compact mmapped export.
+# Trains a synthetic TF-IDF + LR model with a full-size vocabulary (or uses
+# --model-dir), then loads it in fresh interpreters the way a uvicorn worker would.
+# RssAnon is memory private to the worker; RssFile is mmapped file pages, which are
+# shared between all workers on the node.
+
+_PROBE = """
+import json, time
+def status():
+    fields = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("VmRSS", "RssAnon", "RssFile"):
+                fields[key] = int(value.split()[0]) / 1024
+    return fields
+import numpy, sklearn.feature_extraction.text, sklearn.linear_model
+from app.ml.model_store import load_artifacts
+before = status()
+start = time.perf_counter()
+artifacts = load_artifacts()
+artifacts.scorer.predict_proba(["warmup coffee at the station"])
+elapsed = time.perf_counter() - start
+after = status()
+print(json.dumps({"load_ms": elapsed * 1000, **{k: after[k] - before.get(k, 0) for k in after}}))
+"""
+
+
+def _train(rows: int) -> None:
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import Pipeline
+
+    from app.ml.model_store import save_artifacts
+
+    rng = random.Random(0)
+    words = [f"merchant{i}" for i in range(20000)]
+    labels = ["Groceries", "Restaurant", "Transport", "Fuel", "Rent", "Phone", "EMI", "Other"]
+    X = [" ".join(rng.choices(words, k=rng.randint(2, 6))) for _ in range(rows)]
+    y = [rng.choice(labels) for _ in X]
+    pipeline = Pipeline(
+        steps=[
+            ("tfidf", TfidfVectorizer(ngram_range=(1, 2), min_df=2, max_features=50000)),
+            ("clf", LogisticRegression(max_iter=200)),
+        ]
+    )
+    pipeline.fit(X, y)
+    save_artifacts(pipeline=pipeline, labels=sorted(set(y)))
+
+
+def _probe(model_dir: str, fmt: str) -> dict:
+    env = {**os.environ, "MODEL_DIR": model_dir, "MODEL_FORMAT": fmt}
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE], env=env, cwd=backend_dir, capture_output=True, text=True, check=True
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare joblib and compact model loading")
+    parser.add_argument("--model-dir", help="existing MODEL_DIR (default: train a synthetic model)")
+    parser.add_argument("--rows", type=int, default=60000)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+    os.environ.setdefault("JWT_SECRET", "bench")
+    model_dir = args.model_dir or tempfile.mkdtemp(prefix="model-bench-")
+    os.environ["MODEL_DIR"] = model_dir
+    os.environ["MODEL_FORMAT"] = "compact"
+    if args.model_dir:
+        from app.ml.compact import export_compact
+        from app.ml.model_store import load_joblib_artifacts
+
+        artifacts = load_joblib_artifacts()
+        if artifacts is None:
+            raise SystemExit(f"No joblib model in {model_dir}")
+        export_compact(artifacts.pipeline, artifacts.labels, model_dir, artifacts.version)
+    else:
+        _train(args.rows)
+
+    for fmt in ("joblib", "compact"):
+        results = [_probe(model_dir, fmt) for _ in range(args.runs)]
+        best = min(results, key=lambda r: r["load_ms"])
+        print(
+            f"{fmt:8} load {best['load_ms']:7.1f} ms   RSS +{best['VmRSS']:6.1f} MiB "
+            f"(private {best['RssAnon']:6.1f} MiB, shared file {best['RssFile']:6.1f} MiB)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import argparse
+import os
+import subprocess
+import sys
+
+# Cold-start check: imports app.main in a fresh interpreter under -X importtime and
+# fails when the cumulative import time exceeds the budget or when a dependency that
+# is supposed to load lazily shows up at startup.
+
+LAZY_MODULES = ("pandas", "sklearn", "scipy", "joblib", "langchain_google_genai", "langchain_core", "reportlab")
+
+
+def measure(target: str) -> tuple[dict[str, int], str]:
+    env = {**os.environ, "MONGODB_URI": os.environ.get("MONGODB_URI", "mongodb://localhost:27017")}
+    env.setdefault("JWT_SECRET", "bench")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        env=env,
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    if proc.returncode != 0:
+        raise SystemExit(proc.stderr)
+    cumulative: dict[str, int] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cum, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if cum.isdigit():
+            cumulative[name] = int(cum)
+    return cumulative, proc.stderr
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure API cold-start import time")
+    parser.add_argument("--target", default="app.main")
+    parser.add_argument("--budget-ms", type=float, default=1500.0)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    cumulative, _ = measure(args.target)
+    total_ms = cumulative.get(args.target, 0) / 1000
+    print(f"import {args.target}: {total_ms:.0f} ms (budget {args.budget_ms:.0f} ms)")
+
+    top_level = {name: us for name, us in cumulative.items() if "." not in name and name != args.target}
+    for name, us in sorted(top_level.items(), key=lambda kv: kv[1], reverse=True)[: args.top]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    eager = [m for m in LAZY_MODULES if m in cumulative]
+    if eager:
+        print(f"imported at startup but should be lazy: {', '.join(eager)}")
+    return 1 if eager or total_ms > args.budget_ms else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
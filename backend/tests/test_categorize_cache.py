@@ -0,0 +1,43 @@
+from app.services import categorizer
+from app.services.categorizer import CategorizeResult, _cacheable
+
+
+def _result(source, confidence=0.9):
+    return CategorizeResult(category="Other", confidence=confidence, source=source, explanation="")
+
+
+def test_fallbacks_are_not_cached_when_llm_enabled(monkeypatch):
+    monkeypatch.setattr(categorizer, "llm_enabled", lambda: True)
+    assert not _cacheable(_result("default", 0.25))
+    assert not _cacheable(_result("ml", 0.1))
+    assert not _cacheable(_result("fallback", 0.0))
+    assert _cacheable(_result("ml", 0.99))
+    assert _cacheable(_result("gemini"))
+
+
+def test_default_is_cached_without_llm(monkeypatch):
+    monkeypatch.setattr(categorizer, "llm_enabled", lambda: False)
+    assert _cacheable(_result("default", 0.25))
+    assert not _cacheable(_result("fallback", 0.0))
+
+
+def test_cache_is_keyed_on_the_scoring_model(monkeypatch):
+    import asyncio
+
+    from app.services.inference import InferenceExecutor
+
+    executor = InferenceExecutor("thread", workers=1, queue_size=1)
+    categorizer.result_cache.clear()
+    monkeypatch.setattr(categorizer, "inference", executor)
+    monkeypatch.setattr(categorizer.registry, "check_due", lambda: False)
+    # This process already reloaded the retrained model; the worker still scores with v1
+    monkeypatch.setattr(categorizer.registry, "current_version", lambda: "v2")
+    monkeypatch.setattr(categorizer, "_ml_predict_many", lambda ds: ("v1", [("Travel", 0.99, [])] * len(ds)))
+    try:
+        result = asyncio.run(categorizer.categorize_many(["zq payment 42"], wait=True))[0]
+    finally:
+        executor.shutdown()
+
+    assert result.category == "Travel"
+    assert categorizer.result_cache.get("v1:zq payment 42") is not None
+    assert categorizer.result_cache.get("v2:zq payment 42") is None
@@ -0,0 +1,48 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from mongomock_motor import AsyncMongoMockClient
+
+from app.services.corrections import _claim, _upsert_override, fold_corrections
+
+
+def _correction(cid, category, created_at):
+    return {
+        "_id": cid,
+        "user_id": "u1",
+        "transaction_id": cid,
+        "description": "Coffee at Joe's",
+        "category": category,
+        "created_at": created_at,
+        "folded_at": None,
+    }
+
+
+def test_each_correction_is_claimed_once():
+    async def main():
+        db = AsyncMongoMockClient()["test"]
+        await db.corrections.insert_one(_correction("c1", "Snacks", datetime(2025, 1, 1)))
+        return await _claim(db, 100), await _claim(db, 100)
+
+    first, second = asyncio.run(main())
+    assert [doc["_id"] for doc in first] == ["c1"]
+    assert second == []
+
+
+def test_older_correction_cannot_overwrite_newer_override():
+    async def main():
+        db = AsyncMongoMockClient()["test"]
+        t0 = datetime(2025, 1, 1)
+        # Worker B folded the newer correction first...
+        await db.corrections.insert_one(_correction("c2", "Coffee", t0 + timedelta(minutes=1)))
+        await fold_corrections(db)
+        # ...then worker A, holding only the older one, finishes its fold
+        key = (await db.user_overrides.find_one({"user_id": "u1"}))["key"]
+        await _upsert_override(db, "u1", key, _correction("c1", "Snacks", t0), datetime.utcnow())
+        stale = await db.user_overrides.find_one({"user_id": "u1"})
+        await _upsert_override(db, "u1", key, _correction("c3", "Dining", t0 + timedelta(minutes=2)), datetime.utcnow())
+        return stale, await db.user_overrides.find_one({"user_id": "u1"})
+
+    stale, newest = asyncio.run(main())
+    assert stale["category"] == "Coffee"
+    assert newest["category"] == "Dining"
@@ -0,0 +1,122 @@
+import asyncio
+import io
+from datetime import datetime, timedelta
+
+from mongomock_motor import AsyncMongoMockClient
+
+from app.core.config import settings
+from app.services import ingest
+from app.services.categorizer import CategorizeResult
+
+# Six records over more lines: two descriptions contain quoted newlines
+CSV = (
+    "date,amount,description\n"
+    '2025-01-01,10,"coffee\nat joe\'s"\n'
+    "2025-01-02,20,groceries\n"
+    '2025-01-03,30,"rent\nfor\njanuary"\n'
+    "2025-01-04,40,fuel\n"
+    "2025-01-05,50,phone bill\n"
+    "2025-01-06,60,movie\n"
+)
+
+
+class Crash(BaseException):
+    # Not an Exception, so run_ingest_job cannot mark the job failed: like a killed worker
+    pass
+
+
+async def _categorize(db, user_id, descriptions):
+    return [CategorizeResult(category="Other", confidence=0.5, source="ml", explanation="") for _ in descriptions]
+
+
+def test_crashed_job_resumes_without_losing_or_duplicating_rows(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "INGEST_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "INGEST_JOB_STALE_SECONDS", 60.0)
+    monkeypatch.setattr(ingest, "_categorize_rows", _categorize)
+    rebuilt = []
+
+    async def fake_rebuild(db, user_id=None):
+        rebuilt.append(user_id)
+        return 0
+
+    monkeypatch.setattr(ingest, "rebuild_rollups", fake_rebuild)
+
+    record_inserted = ingest.record_inserted
+    flushes = 0
+
+    async def crash_on_second_chunk(db, docs):
+        nonlocal flushes
+        flushes += 1
+        if flushes == 2:
+            # insert_many of the second chunk went through, its rollup delta did not
+            raise Crash()
+        await record_inserted(db, docs)
+
+    async def main():
+        db = AsyncMongoMockClient()["test"]
+        job = await ingest.create_ingest_job(db, "u1", io.BytesIO(CSV.encode()), "t.csv", batch_size=2)
+
+        monkeypatch.setattr(ingest, "record_inserted", crash_on_second_chunk)
+        try:
+            await ingest.run_ingest_job(db, job["_id"])
+        except Crash:
+            pass
+        crashed = await db.jobs.find_one({"_id": job["_id"]})
+
+        # Still running with a fresh heartbeat: nobody else may claim it yet
+        assert await ingest.jobs.claim_job(db, job["_id"], settings.INGEST_JOB_STALE_SECONDS) is None
+        await db.jobs.update_one(
+            {"_id": job["_id"]}, {"$set": {"heartbeat_at": datetime.utcnow() - timedelta(minutes=5)}}
+        )
+
+        monkeypatch.setattr(ingest, "record_inserted", record_inserted)
+        await ingest.run_ingest_job(db, job["_id"])
+        done = await db.jobs.find_one({"_id": job["_id"]})
+        txs = [doc async for doc in db.transactions.find({}).sort("date", 1)]
+        return crashed, done, txs
+
+    crashed, done, txs = asyncio.run(main())
+
+    assert crashed["status"] == "running"
+    assert crashed["rows_done"] == 2
+    assert done["status"] == "done"
+    assert done["attempts"] == 2
+    assert done["rows_done"] == 6
+    assert done["failed"] == 0
+    # Chunk two was written before the crash; on resume its duplicates count as inserted
+    assert done["inserted"] == 6
+    assert done["skipped"] == 0
+    assert [t["description"] for t in txs] == [
+        "coffee\nat joe's", "groceries", "rent\nfor\njanuary", "fuel", "phone bill", "movie"
+    ]
+    assert len({t["_id"] for t in txs}) == 6
+    # The second chunk never got its rollup delta, so the resumed job recomputes them
+    assert rebuilt == ["u1"]
+
+
+def test_heartbeat_stays_fresh_during_a_slow_chunk(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "INGEST_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "INGEST_JOB_STALE_SECONDS", 0.3)
+    db = job_id = None
+    claims = []
+
+    async def slow_categorize(db_, user_id, descriptions):
+        # Far longer than the stale timeout; a second worker must still not claim the job
+        for _ in range(4):
+            await asyncio.sleep(0.2)
+            claims.append(await ingest.jobs.claim_job(db, job_id, settings.INGEST_JOB_STALE_SECONDS))
+        return await _categorize(db_, user_id, descriptions)
+
+    monkeypatch.setattr(ingest, "_categorize_rows", slow_categorize)
+
+    async def main():
+        nonlocal db, job_id
+        db = AsyncMongoMockClient()["test"]
+        job = await ingest.create_ingest_job(db, "u1", io.BytesIO(CSV.encode()), "t.csv", batch_size=10)
+        job_id = job["_id"]
+        await ingest.run_ingest_job(db, job_id)
+        return await db.jobs.find_one({"_id": job_id})
+
+    done = asyncio.run(main())
+    assert claims == [None] * 4
+    assert done["status"] == "done" and done["attempts"] == 1 and done["inserted"] == 6
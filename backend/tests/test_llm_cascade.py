@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+from app.services import categorizer, gemini
+from app.services.batching import BatchScheduler
+from app.services.inference import InferenceExecutor
+
+LABELS = ["Travel", "Books", "Other"]
+
+
+class SlowLLM(gemini.FakeLLMBackend):
+    async def classify_batch(self, descriptions, labels):
+        self.calls += 1
+        await asyncio.sleep(1)
+        return [None] * len(descriptions)
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    # Returns a function installing an LLM backend behind a fresh scheduler; ML runs in
+    # a thread executor and is confident only about descriptions containing "sure"
+    executor = InferenceExecutor("thread", workers=1, queue_size=4)
+    categorizer.result_cache.clear()
+    monkeypatch.setattr(categorizer, "inference", executor)
+    monkeypatch.setattr(categorizer.registry, "check_due", lambda: False)
+    monkeypatch.setattr(categorizer.registry, "current_version", lambda: "v1")
+
+    async def labels():
+        return LABELS
+
+    monkeypatch.setattr(gemini, "_candidate_labels", labels)
+
+    def predict(descriptions):
+        return "v1", [("Other", 0.9 if "sure" in d else 0.3, [("Other", 0.3), ("Books", 0.2)]) for d in descriptions]
+
+    monkeypatch.setattr(categorizer, "_ml_predict_many", predict)
+
+    def install(backend, timeout=5.0):
+        monkeypatch.setattr(gemini, "backend", backend)
+        scheduler = BatchScheduler(
+            gemini._classify_batch, 25, window=0.02, max_concurrency=2, timeout=timeout, fallback=lambda _: None
+        )
+        monkeypatch.setattr(gemini, "scheduler", scheduler)
+        return backend, scheduler
+
+    yield install
+    executor.shutdown()
+
+
+def test_low_confidence_ml_results_are_escalated(llm):
+    fake, _ = llm(gemini.FakeLLMBackend())
+    results = asyncio.run(categorizer.categorize_many(["zq travel agency", "zq books store", "zq sure thing"]))
+
+    assert [(r.category, r.source) for r in results] == [("Travel", "gemini"), ("Books", "gemini"), ("Other", "ml")]
+    # The ML runners-up stay attached to the escalated answer
+    assert results[0].alternatives == [("Other", 0.3), ("Books", 0.2)]
+    assert fake.calls == 1
+
+
+def test_concurrent_escalations_share_one_batch(llm):
+    fake, scheduler = llm(gemini.FakeLLMBackend())
+
+    async def main():
+        return await asyncio.gather(*(categorizer.categorize_many([f"zq travel {i}"], wait=True) for i in range(5)))
+
+    results = asyncio.run(main())
+    assert all(r[0].source == "gemini" for r in results)
+    assert fake.calls == 1
+    assert scheduler.batches == 1 and scheduler.items == 5
+
+
+def test_unanswered_escalation_falls_back_and_is_not_cached(llm):
+    fake, _ = llm(gemini.FakeLLMBackend())
+    # No label in the description: the LLM has no answer, so the weak ML guess stands
+    result = asyncio.run(categorizer.categorize_many(["zq mystery"]))[0]
+    assert (result.source, result.confidence) == ("ml", 0.3)
+    assert categorizer.result_cache.get("v1:zq mystery") is None
+
+    asyncio.run(categorizer.categorize_many(["zq mystery"]))
+    assert fake.calls == 2
+
+
+def test_timed_out_escalation_falls_back_and_is_not_cached(llm, monkeypatch):
+    slow, scheduler = llm(SlowLLM(), timeout=0.1)
+    result = asyncio.run(categorizer.categorize_many(["zq travel agency"]))[0]
+    assert (result.source, result.confidence) == ("ml", 0.3)
+    assert scheduler.failures == 1
+
+    # Without a model there is no ML guess either, so the default answers
+    monkeypatch.setattr(categorizer, "_ml_predict_many", lambda ds: (None, None))
+    result = asyncio.run(categorizer.categorize_many(["zq books store"]))[0]
+    assert result.source == "default"
+    assert len(categorizer.result_cache) == 0
+    assert slow.calls == 2
+
+
+def test_candidate_labels_come_from_the_inference_worker(monkeypatch):
+    executor = InferenceExecutor("thread", workers=1, queue_size=1)
+    fetched = []
+
+    def worker_labels():
+        fetched.append(1)
+        return "v1", ["Travel", "Books"]
+
+    monkeypatch.setattr(gemini, "inference", executor)
+    monkeypatch.setattr(gemini, "model_labels", worker_labels)
+    monkeypatch.setattr(gemini, "_labels", None)
+    monkeypatch.setattr(gemini.registry, "check_due", lambda: False)
+    monkeypatch.setattr(gemini.registry, "current_version", lambda: "v1")
+    monkeypatch.setattr(gemini.registry, "get", lambda: pytest.fail("loaded the model on the event loop"))
+
+    async def main():
+        return [await gemini._candidate_labels() for _ in range(3)]
+
+    try:
+        labels = asyncio.run(main())
+    finally:
+        executor.shutdown()
+    assert labels == [["Travel", "Books", "Other"]] * 3
+    # Cached until the model version on disk changes
+    assert len(fetched) == 1
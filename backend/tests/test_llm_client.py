@@ -0,0 +1,90 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from mongomock_motor import AsyncMongoMockClient
+
+from app.routers import insights
+from app.services.llm import LLMClient
+from app.services.rollups import record_inserted
+
+
+class FakeChat:
+    # Stands in for the langchain chat model behind LLMClient
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+        self.running = 0
+        self.peak = 0
+
+    async def ainvoke(self, prompt):
+        self.calls += 1
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.running -= 1
+        return SimpleNamespace(content=" Spent most on Travel. ")
+
+
+def _client(chat, max_concurrency=4, timeout=5.0):
+    client = LLMClient("key", "model", max_concurrency=max_concurrency, timeout=timeout)
+    client._llm = chat
+    return client
+
+
+def test_client_caps_calls_in_flight():
+    chat = FakeChat(delay=0.05)
+    client = _client(chat, max_concurrency=2)
+
+    async def main():
+        return await asyncio.gather(*(client.generate(f"prompt {i}") for i in range(6)))
+
+    assert asyncio.run(main()) == ["Spent most on Travel."] * 6
+    assert chat.peak == 2
+    assert client.calls == 6 and client.in_flight == 0
+
+
+def _tx(tx_id, amount):
+    return {"_id": tx_id, "user_id": "u1", "date": datetime(2025, 3, 4), "amount": amount, "category": "Travel"}
+
+
+def test_summary_timeout_maps_to_504(monkeypatch):
+    client = _client(FakeChat(delay=1.0), timeout=0.05)
+    monkeypatch.setattr(insights, "get_llm_client", lambda: client)
+
+    async def main():
+        db = AsyncMongoMockClient()["test"]
+        await record_inserted(db, [_tx("a", 10.0)])
+        with pytest.raises(HTTPException) as exc:
+            await insights.monthly_ai_summary("2025-03", user={"_id": "u1"}, db=db)
+        return exc.value, await db.insight_summaries.count_documents({})
+
+    error, cached = asyncio.run(main())
+    assert error.status_code == 504
+    assert client.timeouts == 1
+    assert cached == 0
+
+
+def test_unchanged_month_is_served_from_the_summary_cache(monkeypatch):
+    chat = FakeChat()
+    monkeypatch.setattr(insights, "get_llm_client", lambda: _client(chat))
+
+    async def main():
+        db = AsyncMongoMockClient()["test"]
+        await record_inserted(db, [_tx("a", 10.0)])
+        first = await insights.monthly_ai_summary("2025-03", user={"_id": "u1"}, db=db)
+        again = await insights.monthly_ai_summary("2025-03", user={"_id": "u1"}, db=db)
+        calls_before_change = chat.calls
+        await record_inserted(db, [_tx("b", 5.0)])
+        await insights.monthly_ai_summary("2025-03", user={"_id": "u1"}, db=db)
+        return first, again, calls_before_change
+
+    first, again, calls_before_change = asyncio.run(main())
+    assert again == first
+    assert calls_before_change == 1
+    # New spending in the month changes the totals hash and asks the LLM again
+    assert chat.calls == 2
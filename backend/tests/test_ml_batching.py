@@ -0,0 +1,41 @@
+import asyncio
+import time
+
+from app.core.config import settings
+from app.services import categorizer
+from app.services.batching import BatchScheduler
+from app.services.inference import InferenceBusy, InferenceExecutor
+
+
+def _slow_predict(descriptions):
+    time.sleep(0.02)
+    return "v1", [("Other", 0.9, [("Other", 0.9)]) for _ in descriptions]
+
+
+def test_overload_is_rejected(monkeypatch):
+    executor = InferenceExecutor("thread", workers=1, queue_size=1)
+    monkeypatch.setattr(settings, "ML_BATCH_SIZE", 4)
+    monkeypatch.setattr(categorizer, "inference", executor)
+    monkeypatch.setattr(categorizer, "_ml_predict_many", _slow_predict)
+    monkeypatch.setattr(
+        categorizer,
+        "ml_scheduler",
+        BatchScheduler(categorizer._ml_batch, max_batch=4, window=0.005, max_concurrency=executor.capacity),
+    )
+
+    async def main():
+        return await asyncio.gather(
+            *(categorizer._ml_predict([f"row {i}"], wait=False) for i in range(200)), return_exceptions=True
+        )
+
+    try:
+        results = asyncio.run(main())
+    finally:
+        executor.shutdown()
+
+    rejected = [r for r in results if isinstance(r, InferenceBusy)]
+    served = [r for r in results if isinstance(r, list)]
+    assert len(served) == executor.capacity * 4
+    assert len(rejected) == 200 - len(served)
+    assert executor.stats()["rejected"] == len(rejected)
+    assert categorizer.ml_scheduler.outstanding == 0
@@ -0,0 +1,55 @@
+import asyncio
+import os
+from datetime import datetime
+
+from mongomock_motor import AsyncMongoMockClient
+
+from app.core.config import settings
+from app.services import reports
+from app.services.reports import cached_report_path, data_version
+from app.services.rollups import get_data_version, record_deleted, record_inserted
+
+
+def _tx(tx_id, amount=10.0):
+    return {"_id": tx_id, "user_id": "u1", "date": datetime(2025, 2, 3), "amount": amount, "category": "Food"}
+
+
+def test_delete_and_readd_changes_report_key():
+    async def main():
+        db = AsyncMongoMockClient()["test"]
+        await record_inserted(db, [_tx("a")])
+        before = cached_report_path("u1", "2025-02", data_version(await get_data_version(db, "u1")))
+        await record_deleted(db, [_tx("a")])
+        await record_inserted(db, [_tx("b")])
+        after = cached_report_path("u1", "2025-02", data_version(await get_data_version(db, "u1")))
+        # Rollup totals are identical again, but the report must be rendered afresh
+        rollup = await db.monthly_rollups.find_one({"user_id": "u1"})
+        return before, after, rollup
+
+    before, after, rollup = asyncio.run(main())
+    assert rollup["total"] == 10.0 and rollup["count"] == 1
+    assert before != after
+
+
+def test_render_keeps_newer_versions_and_serves_its_own(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "REPORT_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(reports, "get_executor", lambda: None)  # render in a thread
+    older, newer = (cached_report_path("u1", "2025-02", data_version(n)) for n in (3, 7))
+    other_scope = cached_report_path("u1", "all", data_version(1))
+    for path in (older, newer, other_scope):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, "wb").close()
+
+    rendered = cached_report_path("u1", "2025-02", data_version(5))
+
+    async def main():
+        pdf = await reports.render_report(rendered, "t", [("2025-02-03", 1.0, "Food", "x")], [("Food", 1.0)])
+        # A render for even newer data drops this version while the request still holds it
+        os.unlink(rendered)
+        with pdf:
+            return pdf.read()
+
+    body = asyncio.run(main())
+    assert body.startswith(b"%PDF")
+    assert not os.path.exists(older)
+    assert os.path.exists(newer) and os.path.exists(other_scope)
@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from app.services import rollups
+
+
+def test_backfill_runs_once(monkeypatch):
+    calls = []
+
+    async def fake_rebuild(db, user_id=None):
+        calls.append(user_id)
+        return 0
+
+    monkeypatch.setattr(rollups, "rebuild_rollups", fake_rebuild)
+
+    async def main():
+        db = AsyncMongoMockClient()["test"]
+        first = await rollups.backfill_rollups(db)
+        second = await rollups.backfill_rollups(db)
+        return first, second, await db.migrations.find_one({"_id": rollups.BACKFILL_MARKER})
+
+    first, second, marker = asyncio.run(main())
+    assert (first, second) == (True, False)
+    assert calls == [None]
+    assert marker["status"] == "done"
+
+
+def test_failed_backfill_is_retried(monkeypatch):
+    async def broken_rebuild(db, user_id=None):
+        raise RuntimeError("boom")
+
+    async def main():
+        db = AsyncMongoMockClient()["test"]
+        monkeypatch.setattr(rollups, "rebuild_rollups", broken_rebuild)
+        with pytest.raises(RuntimeError):
+            await rollups.backfill_rollups(db)
+
+        async def ok(db, user_id=None):
+            return 0
+
+        monkeypatch.setattr(rollups, "rebuild_rollups", ok)
+        return await rollups.backfill_rollups(db)
+
+    assert asyncio.run(main()) is True
@@ -0,0 +1,55 @@
+import random
+
+import pytest
+
+from app.core.config import settings
+from app.ml import trainer
+
+
+def _dataset(path):
+    rng = random.Random(0)
+    words = {
+        "Groceries": ["walmart", "grocery", "market", "bazaar"],
+        "Transport": ["uber", "metro", "taxi", "bus"],
+        "Dining": ["cafe", "pizza", "restaurant", "diner"],
+    }
+    lines = ["description,category"]
+    for _ in range(90):
+        label = rng.choice(sorted(words))
+        lines.append(f"{' '.join(rng.sample(words[label], 2))} {rng.randint(1, 99)},{label}")
+    path.write_text("\n".join(lines) + "\n")
+
+
+def test_compact_tuning_only_searches_exportable_models(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "MODEL_FORMAT", "compact")
+    monkeypatch.setattr(settings, "MODEL_DIR", str(tmp_path / "model"))
+    monkeypatch.setattr(settings, "TRAIN_SEARCH_JOBS", 1)
+    assert all(grid["tfidf__analyzer"] == ["word"] for grid in trainer.param_grid())
+
+    _dataset(tmp_path / "train.csv")
+    result = trainer.train_from_csv(str(tmp_path / "train.csv"), "description", "category", tune=True, cv_folds=3)
+
+    assert result.metrics["search"]["best_params"]["tfidf__analyzer"] == "word"
+    assert result.metrics["model_format"] == "compact"
+
+
+def test_joblib_tuning_keeps_char_ngrams(monkeypatch):
+    monkeypatch.setattr(settings, "MODEL_FORMAT", "joblib")
+    assert {grid["tfidf__analyzer"][0] for grid in trainer.param_grid()} == {"word", "char_wb"}
+
+
+@pytest.mark.parametrize("fmt", ["joblib", "compact"])
+def test_registry_reads_version_without_loading(monkeypatch, tmp_path, fmt):
+    from app.ml import model_store
+
+    monkeypatch.setattr(settings, "MODEL_FORMAT", fmt)
+    monkeypatch.setattr(settings, "MODEL_DIR", str(tmp_path / "model"))
+    monkeypatch.setattr(settings, "TRAIN_SEARCH_JOBS", 1)
+    _dataset(tmp_path / "train.csv")
+    trainer.train_from_csv(str(tmp_path / "train.csv"), "description", "category", tune=False)
+    expected = model_store.load_artifacts().version
+
+    registry = model_store.ModelRegistry(check_interval=0)
+    monkeypatch.setattr(model_store, "load_artifacts", lambda: pytest.fail("loaded the model"))
+    assert registry.current_version() == expected
+    assert registry.loads == 0
@@ -0,0 +1,46 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from mongomock_motor import AsyncMongoMockClient
+
+from app.core.config import settings
+from app.services import jobs, training
+
+
+def _slow_train(*args):
+    time.sleep(0.8)
+    return SimpleNamespace(metrics={"accuracy": 1.0}, confusion_matrix=[[1]], labels=["Other"])
+
+
+def test_running_training_job_is_kept_alive_and_dead_ones_fail(monkeypatch):
+    monkeypatch.setattr(settings, "TRAIN_JOB_STALE_SECONDS", 0.3)
+    monkeypatch.setattr(training, "get_executor", lambda: None)  # train in a thread
+    monkeypatch.setattr(training, "train_from_csv", _slow_train)
+
+    async def main():
+        db = AsyncMongoMockClient()["test"]
+        dead = await jobs.create_job(db, training.JOB_KIND, "u1")
+        await db.jobs.update_one(
+            {"_id": dead["_id"]},
+            {"$set": {"status": jobs.STATUS_RUNNING, "heartbeat_at": datetime.utcnow() - timedelta(minutes=5)}},
+        )
+        ingest_job = await jobs.create_job(
+            db, "ingest", "u1", status=jobs.STATUS_RUNNING, heartbeat_at=datetime(2020, 1, 1)
+        )
+        live = await training.start_training_job(db, "u1", "unused.csv", "description", "category")
+
+        # Sweeps while the live job trains for longer than the stale timeout
+        failed = []
+        for _ in range(3):
+            await asyncio.sleep(0.25)
+            failed.append(await jobs.fail_stale_jobs(db, training.JOB_KIND, settings.TRAIN_JOB_STALE_SECONDS, "gone"))
+        await asyncio.gather(*training._tasks)
+        return [await db.jobs.find_one({"_id": j["_id"]}) for j in (dead, live, ingest_job)], failed
+
+    (dead, live, ingest_job), failed = asyncio.run(main())
+    assert failed == [1, 0, 0]
+    assert dead["status"] == "failed" and dead["errors"] == ["gone"]
+    assert live["status"] == "done"
+    assert ingest_job["status"] == "running"
@@ -0,0 +1,22 @@
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+from app.services import user_rules
+from app.services.cache import TTLCache
+
+
+def test_engine_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(user_rules, "_engines", TTLCache(maxsize=2, ttl=60.0))
+
+    async def main():
+        db = AsyncMongoMockClient()["test"]
+        for i in range(5):
+            await db.rules.insert_one({"user_id": f"u{i}", "keyword": "netflix", "category": "Subscriptions"})
+            await user_rules.get_rule_engine(db, f"u{i}")
+        cached = await user_rules.get_rule_engine(db, "u4")
+        user_rules.invalidate_user_rules("u4")
+        return cached
+
+    assert asyncio.run(main()) is not None
+    assert len(user_rules._engines) == 1
@@ -1,19 +1,27 @@
-import { useState } from 'react'
-import { useQuery } from '@tanstack/react-query'
+import { useInfiniteQuery } from '@tanstack/react-query'
 
+import Button from '../components/Button'
 import { Card, CardHint, CardTitle } from '../components/Card'
-import Input from '../components/Input'
 import { api } from '../lib/api'
 import { formatCurrency } from '../lib/format'
-import type { TransactionOut } from '../types'
+import type { TransactionPage } from '../types'
 
-export default function History() {
-  const [limit, setLimit] = useState(50)
+const PAGE_SIZE = 50
 
-  const q = useQuery({
-    queryKey: ['recent', limit],
-    queryFn: async () => (await api.get<TransactionOut[]>(`/transactions/recent?limit=${limit}`)).data,
+export default function History() {
+  // Cursor pages from GET /transactions/ (the API caps a page at 200 rows)
+  const q = useInfiniteQuery({
+    queryKey: ['transactions'],
+    queryFn: async ({ pageParam }) =>
+      (
+        await api.get<TransactionPage>('/transactions/', {
+          params: { limit: PAGE_SIZE, cursor: pageParam || undefined },
+        })
+      ).data,
+    initialPageParam: '',
+    getNextPageParam: (last) => last.next_cursor || undefined,
   })
+  const items = q.data?.pages.flatMap((p) => p.items) || []
 
   return (
     <div className="mx-auto max-w-6xl px-4 py-8">
@@ -22,20 +30,15 @@ export default function History() {
           <div className="text-2xl font-semibold text-slate-900">History</div>
           <div className="mt-1 text-sm text-slate-500">Browse your recent transactions</div>
         </div>
-
-        <div className="w-32">
-          <div className="mb-1 text-xs font-medium text-slate-700">Limit</div>
-          <Input value={String(limit)} onChange={(e) => setLimit(Number(e.target.value || '50'))} type="number" />
-        </div>
       </div>
 
       <div className="mt-6">
         <Card>
           <CardTitle>Transactions</CardTitle>
-          <CardHint>{q.isFetching ? 'Loading…' : `${q.data?.length || 0} items`}</CardHint>
+          <CardHint>{q.isFetching ? 'Loading…' : `${items.length} items`}</CardHint>
 
           <div className="mt-4 divide-y divide-slate-100">
-            {(q.data || []).map((t) => (
+            {items.map((t) => (
               <div key={t.id} className="flex items-start justify-between gap-4 py-3">
                 <div className="min-w-0">
                   <div className="truncate text-sm font-medium text-slate-900">{t.description}</div>
@@ -50,8 +53,16 @@ export default function History() {
                 <div className="shrink-0 text-sm font-semibold text-slate-900">{formatCurrency(t.amount)}</div>
               </div>
             ))}
-            {q.data?.length === 0 ? <div className="py-6 text-sm text-slate-500">No data yet.</div> : null}
+            {q.isSuccess && items.length === 0 ? <div className="py-6 text-sm text-slate-500">No data yet.</div> : null}
           </div>
+
+          {q.hasNextPage ? (
+            <div className="mt-4 flex justify-center">
+              <Button onClick={() => q.fetchNextPage()} disabled={q.isFetchingNextPage}>
+                {q.isFetchingNextPage ? 'Loading…' : 'Load more'}
+              </Button>
+            </div>
+          ) : null}
         </Card>
       </div>
     </div>
@@ -5,6 +5,24 @@ import Input from '../components/Input'
 import { Card, CardHint, CardTitle } from '../components/Card'
 import { api } from '../lib/api'
 
+type IngestJob = {
+  id: string
+  status: 'queued' | 'running' | 'done' | 'failed'
+  rows_done: number
+  inserted: number
+  skipped: number
+  failed: number
+  rows_per_sec?: number | null
+  errors: string[]
+}
+
+const POLL_MS = 1000
+
+function describeJob(job: IngestJob) {
+  const rate = job.rows_per_sec ? ` · ${Math.round(job.rows_per_sec)} rows/s` : ''
+  return `Inserted: ${job.inserted} · Skipped: ${job.skipped} · Failed: ${job.failed}${rate}`
+}
+
 export default function Upload() {
   const [file, setFile] = useState<File | null>(null)
   const [message, setMessage] = useState<string | null>(null)
@@ -20,10 +38,21 @@ export default function Upload() {
     try {
       const form = new FormData()
       form.append('file', file)
-      const res = await api.post<{ inserted: number }>('/transactions/upload', form, {
+      const res = await api.post<IngestJob>('/transactions/upload', form, {
         headers: { 'Content-Type': 'multipart/form-data' },
       })
-      setMessage(`Uploaded. Inserted: ${res.data.inserted}`)
+      let job = res.data
+      while (job.status === 'queued' || job.status === 'running') {
+        setMessage(`Processing… ${job.rows_done} rows read`)
+        await new Promise((resolve) => setTimeout(resolve, POLL_MS))
+        job = (await api.get<IngestJob>(`/transactions/jobs/${job.id}`)).data
+      }
+      if (job.status === 'failed') {
+        setMessage(null)
+        setError(`Upload failed: ${job.errors[job.errors.length - 1] || 'unknown error'}`)
+      } else {
+        setMessage(`Uploaded. ${describeJob(job)}`)
+      }
     } catch (err: any) {
       const detail = err?.response?.data?.detail
       const status = err?.response?.status
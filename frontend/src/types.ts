@@ -13,6 +13,11 @@ export type TransactionOut = {
   explanation?: string | null
 }
 
+export type TransactionPage = {
+  items: TransactionOut[]
+  next_cursor?: string | null
+}
+
 export type DashboardSummary = {
   month: string
   total_spend: number